@@ -19,7 +19,7 @@ class _CfnLogTools:
 
     @staticmethod
     def get_cfn_stack_events(stack: Stack) -> List[Event]:
-        return stack.events(refresh=True)
+        return stack.events(full=True)
 
     def get_cfnlogs(self, stack: Stack):
         LOG.info(f"Collecting logs for {stack.name}")
@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple
+
+LOG = logging.getLogger(__name__)
+
+
+class ScheduledRefresh:
+    """Handle for a pending refresh, cancelling it prevents the refresh from being
+    dispatched"""
+
+    def __init__(self, stack: Any, due: float):
+        self.stack = stack
+        self.due = due
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def __repr__(self):
+        return f"<ScheduledRefresh {self.stack} due {self.due} at {hex(id(self))}>"
+
+
+class RefreshScheduler:
+    """Dispatches periodic stack refreshes from a single timer thread.
+
+    Pending refreshes are kept in a heap ordered by due time. Due times are rounded
+    up to ``resolution`` seconds, so refreshes that fall due at (almost) the same
+    moment are dispatched together, and the number of concurrent refreshes (and
+    therefore CloudFormation API calls) is capped by ``max_workers``. Threads are
+    only started once the first refresh is scheduled.
+    """
+
+    def __init__(self, max_workers: int = 8, resolution: float = 1.0):
+        self.max_workers = max_workers
+        self.resolution = resolution
+        self._heap: List[Tuple[float, int, ScheduledRefresh]] = []
+        self._pending: Dict[int, ScheduledRefresh] = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closing = False
+
+    def schedule(self, stack: Any, delay: timedelta) -> ScheduledRefresh:
+        """schedules ``stack.refresh()`` to be called after ``delay``, replacing any
+        refresh already pending for the stack"""
+        due = monotonic() + delay.total_seconds()
+        due = math.ceil(due / self.resolution) * self.resolution
+        entry = ScheduledRefresh(stack, due)
+        with self._condition:
+            if self._closing:
+                entry.cancel()
+                return entry
+            existing = self._pending.get(id(stack))
+            if existing:
+                existing.cancel()
+            self._pending[id(stack)] = entry
+            heapq.heappush(self._heap, (due, next(self._counter), entry))
+            self._start()
+            self._condition.notify()
+        return entry
+
+    def cancel(self, stack: Any) -> None:
+        with self._condition:
+            entry = self._pending.pop(id(stack), None)
+        if entry:
+            entry.cancel()
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len([e for e in self._pending.values() if not e.cancelled])
+
+    def shutdown(self, wait: bool = True) -> None:
+        """cancels all pending refreshes and stops the timer and worker threads, wait
+        only applies to refreshes that are already running. The scheduler can be used
+        again afterwards, threads are restarted on demand"""
+        with self._condition:
+            self._closing = True
+            for _, _, entry in self._heap:
+                entry.cancel()
+            self._heap = []
+            self._pending = {}
+            thread, executor = self._thread, self._executor
+            self._condition.notify_all()
+        if thread:
+            thread.join()
+        if executor:
+            executor.shutdown(wait=wait)
+        with self._condition:
+            self._thread = None
+            self._executor = None
+            self._closing = False
+
+    def _start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._thread = threading.Thread(
+            target=self._run, name="taskcat-refresh-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def _next_batch(self) -> List[ScheduledRefresh]:
+        with self._condition:
+            while not self._closing:
+                now = monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    break
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._condition.wait(timeout)
+            if self._closing:
+                return []
+            slot = self._heap[0][0]
+            batch = []
+            while self._heap and self._heap[0][0] <= slot:
+                _, _, entry = heapq.heappop(self._heap)
+                if entry.cancelled:
+                    continue
+                if self._pending.get(id(entry.stack)) is entry:
+                    del self._pending[id(entry.stack)]
+                batch.append(entry)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            with self._condition:
+                if self._closing:
+                    return
+                executor = self._executor
+            for entry in batch:
+                try:
+                    executor.submit(self._refresh, entry)  # type: ignore
+                except RuntimeError:
+                    # executor was shut down while the batch was being dispatched
+                    return
+
+    @staticmethod
+    def _refresh(entry: ScheduledRefresh) -> None:
+        if entry.cancelled:
+            return
+        try:
+            entry.stack.refresh()
+        except Exception as e:  # pylint: disable=broad-except
+            LOG.warning(f"Failed to refresh stack {entry.stack} {type(e)} {e}")
+            LOG.debug("Traceback:", exc_info=True)
+
+
+REFRESH_SCHEDULER = RefreshScheduler()
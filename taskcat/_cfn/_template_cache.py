@@ -0,0 +1,347 @@
+import gc
+import hashlib
+import io
+import logging
+import os
+import pickle  # nosec
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import cfnlint.decode.cfn_yaml
+from cfnlint.decode.node import dict_node, list_node, str_node
+from cfnlint.version import __version__ as CFNLINT_VERSION
+
+try:
+    # newer cfn-lint versions decode intrinsic functions into dict_node subclasses
+    from cfnlint.decode.node import intrinsic_node as IntrinsicNode
+    from cfnlint.decode.node import sub_node as SubNode
+except ImportError:
+    IntrinsicNode = SubNode = None
+
+try:
+    # and default missing marks to a namedtuple
+    from cfnlint.decode.node import _mark as DefaultMark
+except ImportError:
+    DefaultMark = None
+
+from yaml import Mark
+
+try:
+    # marks are created by libyaml when PyYAML has been built with it
+    from yaml._yaml import Mark as CMark  # pylint: disable=no-name-in-module
+except ImportError:
+    try:
+        from _yaml import Mark as CMark  # type: ignore
+    except ImportError:
+        CMark = None
+
+LOG = logging.getLogger(__name__)
+
+# below this much yaml, starting a pool of processes costs more than it saves
+PARALLEL_DECODE_MIN_BYTES = 256 * 1024
+
+
+def _copy(value):
+    """copies a decoded template, about 10x faster than copy.deepcopy as the marks
+    and strings, which are immutable, are shared rather than copied"""
+    if isinstance(value, dict):
+        copied = {key: _copy(item) for key, item in value.items()}
+        if isinstance(value, dict_node):
+            # type(value) as sub and intrinsic nodes are dict_node subclasses
+            return type(value)(copied, value.start_mark, value.end_mark)
+        return copied
+    if isinstance(value, list):
+        items = [_copy(item) for item in value]
+        if isinstance(value, list_node):
+            return type(value)(items, value.start_mark, value.end_mark)
+        return items
+    return value
+
+
+# cfn-lint's node classes are created at runtime and can't be pickled by reference,
+# so they are pickled as calls to these functions instead
+def _mark(name, line, column):
+    return Mark(name, 0, line, column, None, None)
+
+
+def _dict_node(value, start_mark, end_mark):
+    return dict_node(value, start_mark, end_mark)
+
+
+def _list_node(value, start_mark, end_mark):
+    return list_node(value, start_mark, end_mark)
+
+
+def _str_node(value, start_mark, end_mark):
+    return str_node(value, start_mark, end_mark)
+
+
+def _intrinsic_node(value, start_mark, end_mark):
+    return IntrinsicNode(value, start_mark, end_mark)  # pylint: disable=not-callable
+
+
+def _sub_node(value, start_mark, end_mark):
+    return SubNode(value, start_mark, end_mark)  # pylint: disable=not-callable
+
+
+def _reduce_mark(mark):
+    # the mark's buffer holds the whole template, it is only used for error snippets
+    return _mark, (getattr(mark, "name", ""), mark.line, mark.column)
+
+
+def _reducer(factory, convert):
+    return lambda n: (factory, (convert(n), n.start_mark, n.end_mark))
+
+
+_DISPATCH_TABLE = {
+    Mark: _reduce_mark,
+    dict_node: _reducer(_dict_node, dict),
+    list_node: _reducer(_list_node, list),
+    str_node: _reducer(_str_node, str),
+}
+# the table matches exact types, so every mark and node class has to be listed
+for _type, _reduce in [
+    (CMark, _reduce_mark),
+    (DefaultMark, _reduce_mark),
+    (IntrinsicNode, _reducer(_intrinsic_node, dict)),
+    (SubNode, _reducer(_sub_node, dict)),
+]:
+    if _type is not None:
+        _DISPATCH_TABLE[_type] = _reduce
+
+
+class _Unpickler(pickle.Unpickler):
+    # only what the cache writes can be loaded, so that a tampered cache file can't
+    # be used to run arbitrary code
+    ALLOWED = {
+        (__name__, "_mark"),
+        (__name__, "_dict_node"),
+        (__name__, "_list_node"),
+        (__name__, "_str_node"),
+        (__name__, "_intrinsic_node"),
+        (__name__, "_sub_node"),
+        ("datetime", "date"),
+        ("datetime", "datetime"),
+        ("datetime", "timedelta"),
+        ("datetime", "timezone"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"{module}.{name} is not allowed")
+        return super().find_class(module, name)
+
+
+@contextmanager
+def _gc_paused():
+    # decoding creates a large number of objects that all stay alive, which makes
+    # the garbage collector run repeatedly for nothing, pausing it halves the time
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _parse(raw_template: str, template_path: str):
+    with _gc_paused():
+        return cfnlint.decode.cfn_yaml.loads(raw_template, template_path)
+
+
+def _dumps(template) -> bytes:
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, protocol=4)
+    pickler.dispatch_table = _DISPATCH_TABLE  # type: ignore
+    pickler.dump(template)
+    return buffer.getvalue()
+
+
+def _loads(data: bytes):
+    with _gc_paused():
+        return _Unpickler(io.BytesIO(data)).load()  # nosec
+
+
+def _decode(template_path: str) -> Tuple[str, bytes]:
+    # runs in a worker process, the result is pickled here as the pool's own
+    # pickling can't handle cfn-lint's nodes
+    with open(template_path, "r", encoding="utf-8") as file_handle:
+        raw_template = file_handle.read()
+    template = _parse(raw_template, template_path)
+    return raw_template, _dumps(template)
+
+
+def _key(template_path: str, raw_template: str) -> Tuple[str, str, str]:
+    return (
+        template_path,
+        hashlib.sha256(raw_template.encode("utf-8")).hexdigest(),
+        CFNLINT_VERSION,
+    )
+
+
+class TemplateCache:
+    """Caches decoded templates, keyed on the template's path, a hash of its content
+    and the cfn-lint version used to decode it, so that a template is only parsed
+    again when it changes. Decoded templates are kept in memory and, if cache_dir is
+    set, on disk so that they are re-used by subsequent runs."""
+
+    CACHE_PATH = Path(".taskcat/template_cache")
+    MAX_ENTRIES = 1024
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, template_path: Union[str, Path]) -> Tuple[str, Any]:
+        """returns the raw and decoded template, the decoded template is a copy that
+        the caller is free to modify"""
+        template_path = str(template_path)
+        with open(template_path, "r", encoding="utf-8") as file_handle:
+            raw_template = file_handle.read()
+        key = _key(template_path, raw_template)
+        template = self._get(key)
+        if template is None:
+            template = _parse(raw_template, template_path)
+            self._set(key, template)
+        return raw_template, _copy(template)
+
+    def prefetch(self, template_paths: Iterable[Union[str, Path]]) -> Dict[str, Any]:
+        """decodes the templates that aren't cached yet, across a pool of processes
+        when there's enough yaml for it to pay off. Returns {path: decoded template}
+        for the templates that could be decoded, these are shared with the cache and
+        must not be modified"""
+        templates, pending = self._cached(template_paths)
+        workers = min(len(pending), os.cpu_count() or 1)
+        size = sum(len(raw_template) for raw_template in pending.values())
+        if workers > 1 and size >= PARALLEL_DECODE_MIN_BYTES:
+            try:
+                templates.update(self._decode_parallel(list(pending), workers))
+            except (OSError, BrokenProcessPool) as e:
+                LOG.debug(f"parallel decoding failed, falling back to serial: {e}")
+        for template_path, raw_template in pending.items():
+            if template_path not in templates:
+                template = self._decode(template_path, raw_template)
+                if template is not None:
+                    templates[template_path] = template
+        return templates
+
+    def _decode(self, template_path, raw_template):
+        try:
+            template = _parse(raw_template, template_path)
+        except Exception:  # pylint: disable=broad-except
+            # the error is raised again when the template is loaded
+            LOG.debug(f"failed to decode {template_path}", exc_info=True)
+            return None
+        self._set(_key(template_path, raw_template), template)
+        return template
+
+    def _cached(self, template_paths) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        # splits the templates into {path: decoded} and {path: raw} for the ones
+        # that have to be decoded
+        templates: Dict[str, Any] = {}
+        pending: Dict[str, str] = {}
+        for template_path in {str(path) for path in template_paths}:
+            try:
+                with open(template_path, "r", encoding="utf-8") as file_handle:
+                    raw_template = file_handle.read()
+            except OSError:
+                continue
+            template = self._get(_key(template_path, raw_template))
+            if template is None:
+                pending[template_path] = raw_template
+            else:
+                templates[template_path] = template
+        return templates, pending
+
+    def _decode_parallel(self, template_paths, workers) -> Dict[str, Any]:
+        templates = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {path: executor.submit(_decode, path) for path in template_paths}
+            for template_path, future in futures.items():
+                try:
+                    raw_template, data = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception:  # pylint: disable=broad-except
+                    LOG.debug(f"failed to decode {template_path}", exc_info=True)
+                    continue
+                template = _loads(data)
+                self._set(_key(template_path, raw_template), template, data)
+                templates[template_path] = template
+        return templates
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key):
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return template
+        template = self._read(key)
+        with self._lock:
+            if template is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._add(key, template)
+        return template
+
+    def _set(self, key, template, data: Optional[bytes] = None):
+        with self._lock:
+            self._add(key, template)
+        self._write(key, template, data)
+
+    def _add(self, key, template):
+        self._entries[key] = template
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _file(cache_dir: Path, key) -> Path:
+        name = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+        return cache_dir / f"{name}.pickle"
+
+    def _read(self, key):
+        cache_dir = self.cache_dir
+        if not cache_dir:
+            return None
+        try:
+            with open(self._file(cache_dir, key), "rb") as cache_file:
+                return _loads(cache_file.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # pylint: disable=broad-except
+            LOG.debug(f"ignoring unreadable template cache entry for {key[0]}: {e}")
+            return None
+
+    def _write(self, key, template, data: Optional[bytes] = None):
+        cache_dir = self.cache_dir
+        if not cache_dir:
+            return
+        path = self._file(cache_dir, key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            data = data if data is not None else _dumps(template)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as cache_file:
+                cache_file.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:  # pylint: disable=broad-except
+            LOG.warning(f"failed to cache template {key[0]}: {e}")
+
+
+TEMPLATE_CACHE = TemplateCache()
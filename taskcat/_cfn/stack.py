@@ -4,14 +4,15 @@ import os
 import random
 import re
 import string
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
-from threading import Timer
-from typing import Callable, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
 
 import boto3
 
+from taskcat._cfn._refresh import REFRESH_SCHEDULER
 from taskcat._cfn.template import Template
 from taskcat._common_utils import pascal_to_snake, s3_url_maker
 from taskcat._dataclasses import TestRegion
@@ -25,10 +26,37 @@ GENERIC_ERROR_PATTERNS = [
 
 
 def criteria_matches(criteria: dict, instance):
+    _validate_criteria(criteria, instance)
+    return _matches(criteria, instance)
+
+
+def _validate_criteria(criteria: dict, instance: object):
     # fail if criteria includes an invalid property
+    valid = _class_properties(type(instance))
     for k in criteria:
-        if k not in instance.__dict__:
+        if k not in valid and k not in getattr(instance, "__dict__", {}):
             raise ValueError(f"{k} is not a valid property of {type(instance)}")
+
+
+_CLASS_PROPERTIES: Dict[type, frozenset] = {}
+
+
+def _class_properties(cls: type) -> frozenset:
+    # public slots and properties, slotted classes have no instance __dict__
+    if cls not in _CLASS_PROPERTIES:
+        names = set()
+        for klass in cls.__mro__:
+            for name in getattr(klass, "__slots__", ()):
+                if not name.startswith("_"):
+                    names.add(name)
+            for name, value in vars(klass).items():
+                if isinstance(value, property):
+                    names.add(name)
+        _CLASS_PROPERTIES[cls] = frozenset(names)
+    return _CLASS_PROPERTIES[cls]
+
+
+def _matches(criteria: dict, instance):
     for k, v in criteria.items():
         # matching is AND for multiple criteria, so as soon as one fails,
         # it's not a match
@@ -65,25 +93,56 @@ class Capabilities:
     ALL = [IAM, NAMED_IAM, AUTO_EXPAND]
 
 
+_EPOCH = datetime.fromtimestamp(0)
+
+
+def _intern(value):
+    # event and resource fields repeat across thousands of records, interning them
+    # keeps a single copy of each value in memory
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class Event:
+    __slots__ = (
+        "event_id",
+        "stack_name",
+        "logical_id",
+        "type",
+        "status",
+        "physical_id",
+        "timestamp",
+        "status_reason",
+        "_raw_properties",
+        "_properties",
+    )
+
     def __init__(self, event_dict: dict):
         self.event_id: str = event_dict["EventId"]
-        self.stack_name: str = event_dict["StackName"]
-        self.logical_id: str = event_dict["LogicalResourceId"]
-        self.type: str = event_dict["ResourceType"]
-        self.status: str = event_dict["ResourceStatus"]
+        self.stack_name: str = _intern(event_dict["StackName"])
+        self.logical_id: str = _intern(event_dict["LogicalResourceId"])
+        self.type: str = _intern(event_dict["ResourceType"])
+        self.status: str = _intern(event_dict["ResourceStatus"])
         self.physical_id: str = ""
-        self.timestamp: datetime = datetime.fromtimestamp(0)
+        self.timestamp: datetime = _EPOCH
         self.status_reason: str = ""
-        self.properties: dict = {}
+        self._raw_properties: str = ""
+        self._properties: Optional[dict] = None
         if "PhysicalResourceId" in event_dict.keys():
-            self.physical_id = event_dict["PhysicalResourceId"]
+            self.physical_id = _intern(event_dict["PhysicalResourceId"])
         if "Timestamp" in event_dict.keys():
             self.timestamp = event_dict["Timestamp"]
         if "ResourceStatusReason" in event_dict.keys():
-            self.status_reason = event_dict["ResourceStatusReason"]
+            self.status_reason = _intern(event_dict["ResourceStatusReason"])
         if "ResourceProperties" in event_dict.keys():
-            self.properties = json.loads(event_dict["ResourceProperties"])
+            self._raw_properties = event_dict["ResourceProperties"]
+
+    @property
+    def properties(self) -> dict:
+        # decoded on first access, as only nested stack discovery reads properties
+        if self._properties is None:
+            raw = self._raw_properties
+            self._properties = json.loads(raw) if raw else {}
+        return self._properties
 
     def __str__(self):
         return "{} {} {}".format(self.timestamp, self.logical_id, self.status)
@@ -93,6 +152,18 @@ class Event:
 
 
 class Resource:
+    __slots__ = (
+        "stack_id",
+        "test_name",
+        "uuid",
+        "logical_id",
+        "type",
+        "status",
+        "physical_id",
+        "last_updated_timestamp",
+        "status_reason",
+    )
+
     def __init__(
         self, stack_id: str, resource_dict: dict, test_name: str = "", uuid: UUID = None
     ):
@@ -100,24 +171,26 @@ class Resource:
         self.stack_id: str = stack_id
         self.test_name: str = test_name
         self.uuid: UUID = uuid
-        self.logical_id: str = resource_dict["LogicalResourceId"]
-        self.type: str = resource_dict["ResourceType"]
-        self.status: str = resource_dict["ResourceStatus"]
+        self.logical_id: str = _intern(resource_dict["LogicalResourceId"])
+        self.type: str = _intern(resource_dict["ResourceType"])
+        self.status: str = _intern(resource_dict["ResourceStatus"])
         self.physical_id: str = ""
-        self.last_updated_timestamp: datetime = datetime.fromtimestamp(0)
+        self.last_updated_timestamp: datetime = _EPOCH
         self.status_reason: str = ""
         if "PhysicalResourceId" in resource_dict.keys():
             self.physical_id = resource_dict["PhysicalResourceId"]
         if "LastUpdatedTimestamp" in resource_dict.keys():
             self.last_updated_timestamp = resource_dict["LastUpdatedTimestamp"]
         if "ResourceStatusReason" in resource_dict.keys():
-            self.status_reason = resource_dict["ResourceStatusReason"]
+            self.status_reason = _intern(resource_dict["ResourceStatusReason"])
 
     def __str__(self):
         return "<Resource {} {}>".format(self.logical_id, self.status)
 
 
 class Parameter:
+    __slots__ = ("key", "value", "raw_value", "use_previous_value", "resolved_value")
+
     def __init__(self, param_dict: dict):
         self.key: str = param_dict["ParameterKey"]
         self.value: str = ""
@@ -143,6 +216,8 @@ class Parameter:
 
 
 class Output:
+    __slots__ = ("key", "value", "description", "export_name")
+
     def __init__(self, output_dict: dict):
         self.key: str = output_dict["OutputKey"]
         self.value: str = output_dict["OutputValue"]
@@ -155,6 +230,8 @@ class Output:
 
 
 class Tag:
+    __slots__ = ("key", "value")
+
     def __init__(self, tag_dict: dict):
         if isinstance(tag_dict, Tag):
             tag_dict = {"Key": tag_dict.key, "Value": tag_dict.value}
@@ -167,28 +244,118 @@ class Tag:
 
 
 class FilterableList(list):
+    """A list that can be filtered by item attributes.
+
+    Subclasses can name attributes in INDEXED_FIELDS, filters on these use a hash
+    index instead of scanning the whole list. Indexes are built lazily on first use
+    and dropped whenever the list is modified, so indexed attributes must not change
+    once an item is in the list.
+    """
+
+    INDEXED_FIELDS: Tuple[str, ...] = ()
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._indexes: Dict[str, Tuple[int, Dict[Any, list]]] = {}
+
     def filter(self, criteria: Optional[dict] = None, **kwargs):
         if not criteria and not kwargs:
             return self
         if not criteria:
             criteria = kwargs
-        flist = FilterableList()
-        for item in self:
-            if criteria_matches(criteria, item):
-                flist.append(item)
-        return flist
+        if not self:
+            return type(self)()
+        _validate_criteria(criteria, self[0])
+        candidates: list = self
+        for field in criteria:
+            matches = self._index_lookup(field, criteria[field])
+            if matches is not None and len(matches) < len(candidates):
+                candidates = matches
+        return type(self)(item for item in candidates if _matches(criteria, item))
+
+    def _index_lookup(self, field: str, value: Any) -> Optional[list]:
+        if field not in self.INDEXED_FIELDS:
+            return None
+        try:
+            return self._get_index(field).get(value, [])
+        except TypeError:
+            # unhashable values can't be indexed
+            return None
+
+    def _get_index(self, field: str) -> Dict[Any, list]:
+        length, index = self._indexes.get(field, (-1, {}))
+        # the length check guards against an index built while another thread was
+        # modifying the list
+        if length != len(self):
+            index = {}
+            for item in self:
+                index.setdefault(getattr(item, field, None), []).append(item)
+            self._indexes[field] = (len(self), index)
+        return index
+
+    def _invalidate(self):
+        self._indexes = {}
+
+    def append(self, item):
+        self._invalidate()
+        super().append(item)
+
+    def extend(self, items):
+        self._invalidate()
+        super().extend(items)
+
+    def insert(self, index, item):
+        self._invalidate()
+        super().insert(index, item)
+
+    def remove(self, item):
+        self._invalidate()
+        super().remove(item)
+
+    def pop(self, *args):
+        self._invalidate()
+        return super().pop(*args)
+
+    def clear(self):
+        self._invalidate()
+        super().clear()
+
+    def sort(self, *args, **kwargs):
+        self._invalidate()
+        super().sort(*args, **kwargs)
+
+    def reverse(self):
+        self._invalidate()
+        super().reverse()
+
+    def __setitem__(self, key, value):
+        self._invalidate()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._invalidate()
+        super().__delitem__(key)
+
+    def __iadd__(self, other):  # type: ignore
+        self._invalidate()
+        return super().__iadd__(other)
+
+    def __imul__(self, other):  # type: ignore
+        self._invalidate()
+        return super().__imul__(other)
 
 
 class Stacks(FilterableList):
-    pass
+    # status is deliberately not indexed, as it changes when stacks are refreshed
+    INDEXED_FIELDS = ("id", "test_name", "region_name")
 
 
 class Resources(FilterableList):
-    pass
+    INDEXED_FIELDS = ("logical_id", "physical_id", "status", "test_name")
 
 
 class Events(FilterableList):
-    pass
+    INDEXED_FIELDS = ("logical_id", "physical_id", "status")
 
 
 class Tags(FilterableList):
@@ -240,8 +407,9 @@ class Stack:  # pylint: disable=too-many-instance-attributes
         self._last_event_refresh: datetime = datetime.fromtimestamp(0)
         self._last_resource_refresh: datetime = datetime.fromtimestamp(0)
         self._last_child_refresh: datetime = datetime.fromtimestamp(0)
-        self._timer = Timer(self._auto_refresh_interval.total_seconds(), self.refresh)
-        self._timer.start()
+        self._refresh_handle = REFRESH_SCHEDULER.schedule(
+            self, self._auto_refresh_interval
+        )
 
     def __str__(self):
         return self.id
@@ -296,8 +464,27 @@ class Stack:  # pylint: disable=too-many-instance-attributes
 
     @classmethod
     def _import_child(
-        cls, stack_properties: dict, parent_stack: "Stack"
+        cls, stack_properties: dict, parent_stack: "Stack", logical_id: str = ""
     ) -> Optional["Stack"]:
+        template = None
+        if logical_id:
+            template = parent_stack.template.child_template(logical_id)
+        if not template:
+            template = cls._child_template_from_events(stack_properties, parent_stack)
+        stack = cls(
+            parent_stack.region,
+            stack_properties["StackId"],
+            template,
+            parent_stack.name,
+            parent_stack.uuid,
+        )
+        stack.set_stack_properties(stack_properties)
+        return stack
+
+    @staticmethod
+    def _child_template_from_events(
+        stack_properties: dict, parent_stack: "Stack"
+    ) -> Template:
         url = ""
         for event in parent_stack.events():
             if event.physical_id == stack_properties["StackId"] and event.properties:
@@ -308,6 +495,11 @@ class Stack:  # pylint: disable=too-many-instance-attributes
                 "/"
             )
             absolute_path = parent_stack.template.project_root / relative_path
+            if not absolute_path.is_file():
+                LOG.debug(
+                    f"template for {stack_properties['StackId']} not found in the "
+                    f"parent template or at {absolute_path}"
+                )
         else:
             # Assuming template is remote to project and downloading it
             cfn_client = parent_stack.client
@@ -326,20 +518,11 @@ class Stack:  # pylint: disable=too-many-instance-attributes
             if not absolute_path.exists():
                 with open(absolute_path, "w") as fh:
                     fh.write(tempate_body)
-        template = Template(
+        return parent_stack.template.registry.get(
             template_path=str(absolute_path),
             project_root=parent_stack.template.project_root,
             url=url,
         )
-        stack = cls(
-            parent_stack.region,
-            stack_properties["StackId"],
-            template,
-            parent_stack.name,
-            parent_stack.uuid,
-        )
-        stack.set_stack_properties(stack_properties)
-        return stack
 
     @classmethod
     def import_existing(
@@ -376,7 +559,7 @@ class Stack:  # pylint: disable=too-many-instance-attributes
     def set_stack_properties(self, stack_properties: Optional[dict] = None) -> None:
         # TODO: get time to complete for complete stacks and % complete
         props: dict = stack_properties if stack_properties else {}
-        self._timer.cancel()
+        self._refresh_handle.cancel()
         if not props:
             describe_stacks = self.client.describe_stacks
             props = describe_stacks(StackName=self.id)["Stacks"][0]
@@ -395,10 +578,9 @@ class Stack:  # pylint: disable=too-many-instance-attributes
             key = pascal_to_snake(key).replace("stack_", "")
             setattr(self, key, value)
         if self.status in StackStatus.IN_PROGRESS:
-            self._timer = Timer(
-                self._auto_refresh_interval.total_seconds(), self.refresh
+            self._refresh_handle = REFRESH_SCHEDULER.schedule(
+                self, self._auto_refresh_interval
             )
-            self._timer.start()
 
     @staticmethod
     def _merge_props(existing_props, new):
@@ -410,9 +592,19 @@ class Stack:  # pylint: disable=too-many-instance-attributes
         if not added:
             existing_props.append(new)
 
-    def events(self, refresh: bool = False, include_generic: bool = True) -> Events:
-        if refresh or not self._events or self._auto_refresh(self._last_event_refresh):
-            self._fetch_stack_events()
+    def events(
+        self, refresh: bool = False, include_generic: bool = True, full: bool = False
+    ) -> Events:
+        """returns the stack's events, newest first. Refreshes only fetch events newer
+        than the ones already known, unless full is set, in which case the entire
+        event history is fetched again"""
+        if (
+            refresh
+            or full
+            or not self._events
+            or self._auto_refresh(self._last_event_refresh)
+        ):
+            self._fetch_stack_events(full=full)
         events = self._events
         if not include_generic:
             events = Events([event for event in events if not self._is_generic(event)])
@@ -426,16 +618,32 @@ class Stack:  # pylint: disable=too-many-instance-attributes
                 generic = True
         return generic
 
-    def _fetch_stack_events(self) -> None:
+    def _fetch_stack_events(self, full: bool = False) -> None:
         self._last_event_refresh = datetime.now()
+        known_ids = set() if full else {event.event_id for event in self._events}
         events = Events()
+        # events are returned newest first, so once a known event is reached, all
+        # remaining events (and pages) have already been fetched
         for page in self.client.get_paginator("describe_stack_events").paginate(
             StackName=self.id
         ):
-            for event in page["StackEvents"]:
-                events.append(Event(event))
+            new_events = self._new_events(page["StackEvents"], known_ids)
+            events += new_events
+            if len(new_events) < len(page["StackEvents"]):
+                break
+        if not full:
+            events += self._events
         self._events = events
 
+    @staticmethod
+    def _new_events(event_dicts: List[dict], known_ids: set) -> List[Event]:
+        new_events = []
+        for event in event_dicts:
+            if event.get("EventId") in known_ids:
+                break
+            new_events.append(Event(event))
+        return new_events
+
     def resources(self, refresh: bool = False) -> Resources:
         if (
             refresh
@@ -465,14 +673,21 @@ class Stack:  # pylint: disable=too-many-instance-attributes
 
     def _fetch_children(self) -> None:
         self._last_child_refresh = datetime.now()
-        for page in self.client.get_paginator("describe_stacks").paginate():
-            for stack in page["Stacks"]:
-                if self._children.filter(id=stack["StackId"]):
-                    continue
-                if "ParentId" in stack.keys():
-                    if self.id == stack["ParentId"]:
-                        stack_obj = Stack._import_child(stack, self)
-                        self._children.append(stack_obj)
+        # nested stacks are resources of the parent, so there's no need to scan every
+        # stack in the region for a matching ParentId
+        child_resources = self.resources(refresh=True).filter(
+            type="AWS::CloudFormation::Stack"
+        )
+        for resource in child_resources:
+            if not resource.physical_id:
+                continue
+            if self._children.filter(id=resource.physical_id):
+                continue
+            stack_properties = self.client.describe_stacks(
+                StackName=resource.physical_id
+            )["Stacks"][0]
+            stack_obj = Stack._import_child(stack_properties, self, resource.logical_id)
+            self._children.append(stack_obj)
 
     def children(self, refresh=False) -> Stacks:
         if (
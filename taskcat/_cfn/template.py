@@ -1,33 +1,280 @@
 import logging
+import threading
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
-import cfnlint
+from taskcat._cfn._template_cache import TEMPLATE_CACHE, TemplateCache
 from taskcat.exceptions import TaskCatException
 
 LOG = logging.getLogger(__name__)
 
 
-class Template:
-    def __init__(
+RegistryKey = Tuple[Path, Path, str, str]
+
+
+def _resolve_paths(
+    template_path: Union[str, Path], project_root: Union[str, Path]
+) -> Tuple[Path, Path]:
+    template_path = Path(template_path).expanduser().resolve()
+    project_root = project_root if project_root else template_path.parent.parent
+    return template_path, Path(project_root).expanduser().resolve()
+
+
+def _template_url_to_path(template_url, project_root: Path) -> Path:
+    # TODO: this code assumes a specific url schema, should rather attempt to
+    #  resolve values from params/defaults
+    if isinstance(template_url, dict):
+        if "Fn::Sub" in template_url.keys():
+            if isinstance(template_url["Fn::Sub"], str):
+                template_path = template_url["Fn::Sub"].split("}")[-1]
+            else:
+                template_path = template_url["Fn::Sub"][0].split("}")[-1]
+        elif "Fn::Join" in list(template_url.keys())[0]:
+            template_path = template_url["Fn::Join"][1][-1]
+    elif isinstance(template_url, str):
+        template_path = "/".join(template_url.split("/")[-2:])
+    return project_root / template_path
+
+
+def _child_template_urls(template) -> List:
+    return [
+        resource["Properties"]["TemplateURL"]
+        for resource in template["Resources"].values()
+        if resource["Type"] == "AWS::CloudFormation::Stack"
+    ]
+
+
+def _child_template_paths(template, project_root: Path) -> List[Path]:
+    try:
+        paths = [
+            _template_url_to_path(url, project_root)
+            for url in _child_template_urls(template)
+        ]
+    except Exception:  # pylint: disable=broad-except
+        # invalid templates are reported when they are loaded
+        return []
+    return [path for path in paths if path.is_file()]
+
+
+def prefetch_templates(
+    template_paths: Iterable[Union[str, Path]],
+    project_root: Union[str, Path] = "",
+    cache: Optional[TemplateCache] = None,
+) -> None:
+    """decodes the templates and the templates nested in them into the template
+    cache, a level of nesting at a time so that sibling templates are decoded in
+    parallel, loading the templates afterwards only has to copy them from the cache
+    """
+    cache = cache if cache is not None else TEMPLATE_CACHE
+    level = {_resolve_paths(path, project_root) for path in template_paths}
+    seen = set(level)
+    while level:
+        decoded = cache.prefetch(path for path, _ in level)
+        children: Set[Tuple[Path, Path]] = set()
+        for path, root in level:
+            template = decoded.get(str(path))
+            if template is not None:
+                children.update(
+                    _resolve_paths(child, root)
+                    for child in _child_template_paths(template, root)
+                )
+        level = children - seen
+        seen.update(level)
+
+
+class TemplateRegistry:
+    """Holds a single Template per template file, so that templates shared by
+    several tests, or nested in several parents, are only loaded once.
+
+    Templates are keyed on their resolved path and s3_key_prefix, as well as the
+    project root and url, which are also used to derive the template's s3 key and
+    its children's urls. Templates are decoded through cache, which defaults to the
+    in memory TEMPLATE_CACHE.
+    """
+
+    def __init__(self, cache: Optional[TemplateCache] = None):
+        self.cache = cache if cache is not None else TEMPLATE_CACHE
+        self._templates: Dict[RegistryKey, "Template"] = {}
+        self._graph: Optional[TemplateGraph] = None
+        # re-entrant, as loading a template loads its children through the registry
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._templates)
+
+    @staticmethod
+    def key(
+        template_path: Union[str, Path],
+        project_root: Union[str, Path] = "",
+        url: str = "",
+        s3_key_prefix: str = "",
+    ) -> RegistryKey:
+        template_path, project_root = _resolve_paths(template_path, project_root)
+        return template_path, project_root, s3_key_prefix, url
+
+    def get(
         self,
         template_path: Union[str, Path],
         project_root: Union[str, Path] = "",
         url: str = "",
         s3_key_prefix: str = "",
+        lazy: bool = False,
+    ) -> "Template":
+        """returns the registered template, loading it if it hasn't been yet"""
+        key = self.key(template_path, project_root, url, s3_key_prefix)
+        with self._lock:
+            if key not in self._templates:
+                try:
+                    Template(
+                        template_path, project_root, url, s3_key_prefix, self, lazy
+                    )
+                except Exception:
+                    # the template registers itself before loading its children
+                    self._templates.pop(key, None)
+                    raise
+            return self._templates[key]
+
+    def add(self, template: "Template") -> None:
+        with self._lock:
+            self._templates.setdefault(template.registry_key, template)
+            self._graph = None
+
+    @property
+    def graph(self) -> "TemplateGraph":
+        """the nesting graph of the registered templates, built on first use and
+        rebuilt after templates are added or their children change"""
+        with self._lock:
+            if self._graph is None:
+                # lazy templates that haven't loaded their children yet are left
+                # out, eg. ones that were only loaded for their metadata, but lazy
+                # templates nested in the others are loaded
+                templates = [t for t in self._templates.values() if t.children_loaded]
+                pending = list(templates)
+                seen = set(templates)
+                while pending:
+                    for child in pending.pop().children:
+                        if child not in seen:
+                            seen.add(child)
+                            templates.append(child)
+                            pending.append(child)
+                self._graph = TemplateGraph(templates)
+            return self._graph
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._graph = None
+
+
+class TemplateGraph:
+    """The parent/child relationships between a set of templates, with descendants
+    and ancestors computed once per template, so that repeated queries cost no more
+    than the size of their result. Graphs are snapshots, TemplateRegistry.graph
+    returns one that is current.
+    """
+
+    def __init__(self, templates: Iterable["Template"]):
+        self.nodes: List[Template] = list(templates)
+        self._parents: Dict[Template, List[Template]] = {t: [] for t in self.nodes}
+        self._by_path: Dict[Path, List[Template]] = {}
+        for template in self.nodes:
+            self._by_path.setdefault(template.template_path, []).append(template)
+            for child in template.children:
+                self._parents.setdefault(child, []).append(template)
+        self._descendants: Dict[Template, List[Template]] = {}
+        self._ancestors: Dict[Template, List[Template]] = {}
+
+    def parents(self, template: "Template") -> List["Template"]:
+        return list(self._parents.get(template, []))
+
+    def templates(self, template_path: Union[str, Path]) -> List["Template"]:
+        """returns the templates loaded from a file, there can be more than one if
+        the file was loaded with different s3 key prefixes"""
+        return list(self._by_path.get(Path(template_path).expanduser().resolve(), []))
+
+    @staticmethod
+    def _walk(template: "Template", edges) -> List["Template"]:
+        # depth first, in the order the edges are listed, each template once
+        found: Dict[Template, None] = {template: None}
+        stack = list(reversed(edges(template)))
+        while stack:
+            node = stack.pop()
+            if node in found:
+                continue
+            found[node] = None
+            stack.extend(reversed(edges(node)))
+        return [node for node in found if node is not template]
+
+    def descendants(self, template: "Template") -> List["Template"]:
+        if template not in self._descendants:
+            self._descendants[template] = self._walk(template, lambda t: t.children)
+        return list(self._descendants[template])
+
+    def ancestors(self, template: "Template") -> List["Template"]:
+        if template not in self._ancestors:
+            self._ancestors[template] = self._walk(template, self.parents)
+        return list(self._ancestors[template])
+
+    def topological_order(self) -> List["Template"]:
+        """returns the templates with every parent before its children"""
+        pending = {t: len(self._parents.get(t, [])) for t in self.nodes}
+        ready = [t for t in self.nodes if not pending[t]]
+        order = []
+        while ready:
+            template = ready.pop(0)
+            order.append(template)
+            for child in template.children:
+                pending[child] -= 1
+                if not pending[child]:
+                    ready.append(child)
+        if len(order) < len(self.nodes):
+            cycle = sorted(str(t.template_path) for t in pending if pending[t])
+            raise TaskCatException(f"templates nest each other: {', '.join(cycle)}")
+        return order
+
+    def affected_tests(
+        self, template_path: Union[str, Path], tests: Dict[str, "Template"]
+    ) -> List[str]:
+        """returns the names of the tests, given as {test name: template}, that use
+        the template file, either directly or nested in another template"""
+        affected = set()
+        for template in self.templates(template_path):
+            affected.add(template)
+            affected.update(self.ancestors(template))
+        return [name for name, template in tests.items() if template in affected]
+
+
+class Template:  # pylint: disable=too-many-instance-attributes
+    """A CloudFormation template and the templates nested in it.
+
+    Lazy templates only decode the file when template, raw_template or parameters
+    are first used, and only load their children when children or descendents are
+    first used, so errors in the template are also raised then.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        template_path: Union[str, Path],
+        project_root: Union[str, Path] = "",
+        url: str = "",
+        s3_key_prefix: str = "",
+        registry: Optional[TemplateRegistry] = None,
+        lazy: bool = False,
     ):
-        self.template_path: Path = Path(template_path).expanduser().resolve()
-        self.template = cfnlint.decode.cfn_yaml.load(str(self.template_path))
-        with open(template_path, "r") as file_handle:
-            self.raw_template = file_handle.read()
-        project_root = (
-            project_root if project_root else self.template_path.parent.parent
+        self.template_path, self.project_root = _resolve_paths(
+            template_path, project_root
         )
-        self.project_root = Path(project_root).expanduser().resolve()
         self.url = url
+        self.lazy = lazy
         self._s3_key_prefix = s3_key_prefix
-        self.children: List[Template] = []
-        self._find_children()
+        self._raw_template: Optional[str] = None
+        self._template = None
+        self._children: Optional[List[Template]] = None
+        # children are loaded through the registry, templates that are created
+        # directly get their own
+        self.registry = registry if registry is not None else TemplateRegistry()
+        self.registry.add(self)
+        if not lazy:
+            self._load_children()
 
     def __str__(self):
         return str(self.template)
@@ -35,11 +282,66 @@ class Template:
     def __repr__(self):
         return f"<Template {self.template_path} at {hex(id(self))}>"
 
+    @property
+    def registry_key(self) -> RegistryKey:
+        return self.template_path, self.project_root, self._s3_key_prefix, self.url
+
     @property
     def s3_key(self):
         suffix = str(self.template_path.relative_to(self.project_root))
         return self._s3_key_prefix + suffix
 
+    @property
+    def raw_template(self) -> str:
+        if self._raw_template is None:
+            self._load()
+        return self._raw_template  # type: ignore
+
+    @raw_template.setter
+    def raw_template(self, raw_template: str):
+        self._raw_template = raw_template
+
+    @property
+    def template(self):
+        if self._template is None:
+            self._load()
+        return self._template
+
+    @template.setter
+    def template(self, template):
+        self._template = template
+
+    @property
+    def children(self) -> List["Template"]:
+        if self._children is None:
+            self._load_children()
+        return self._children  # type: ignore
+
+    @children.setter
+    def children(self, children: List["Template"]):
+        self._children = children
+
+    @property
+    def children_loaded(self) -> bool:
+        return self._children is not None
+
+    def _load(self):
+        self._raw_template, self._template = self.registry.cache.load(
+            self.template_path
+        )
+
+    def _load_children(self):
+        with self.registry._lock:  # pylint: disable=protected-access
+            if self._children is not None:
+                return
+            self._children = []
+            try:
+                self._find_children()
+            except Exception:
+                self._children = None
+                raise
+        self.registry.invalidate()
+
     @property
     def linesplit(self):
         return self.raw_template.split("\n")
@@ -49,23 +351,22 @@ class Template:
         the template has been modified"""
         with open(str(self.template_path), "w") as file_handle:
             file_handle.write(self.raw_template)
-        self.template = cfnlint.decode.cfn_yaml.load(self.template_path)
+        _, self.template = self.registry.cache.load(self.template_path)
+        self._refresh_children()
+
+    def reload(self):
+        """re-reads the template from disk, useful if the file has been changed
+        outside of taskcat"""
+        self._load()
+        self._refresh_children()
+
+    def _refresh_children(self):
+        self.children = []
         self._find_children()
+        self.registry.invalidate()
 
     def _template_url_to_path(self, template_url):
-        # TODO: this code assumes a specific url schema, should rather attempt to
-        #  resolve values from params/defaults
-        if isinstance(template_url, dict):
-            if "Fn::Sub" in template_url.keys():
-                if isinstance(template_url["Fn::Sub"], str):
-                    template_path = template_url["Fn::Sub"].split("}")[-1]
-                else:
-                    template_path = template_url["Fn::Sub"][0].split("}")[-1]
-            elif "Fn::Join" in list(template_url.keys())[0]:
-                template_path = template_url["Fn::Join"][1][-1]
-        elif isinstance(template_url, str):
-            template_path = "/".join(template_url.split("/")[-2:])
-        template_path = self.project_root / template_path
+        template_path = _template_url_to_path(template_url, self.project_root)
         if template_path.is_file():
             return template_path
         LOG.error(
@@ -100,45 +401,55 @@ class Template:
                 f"did not receive a valid template: {self.template_path} does not "
                 f"have a Resources section"
             )
-        for resource in self.template["Resources"].keys():
-            resource = self.template["Resources"][resource]
-            if resource["Type"] == "AWS::CloudFormation::Stack":
-                child_name = self._template_url_to_path(
-                    resource["Properties"]["TemplateURL"]
-                )
-                if child_name:
-                    children.add(child_name)
+        for template_url in _child_template_urls(self.template):
+            child_name = self._template_url_to_path(template_url)
+            if child_name:
+                children.add(child_name)
         for child in children:
-            child_template_instance = None
-            for descendent in self.descendents:
-                if str(descendent.template_path) == str(child):
-                    child_template_instance = descendent
-            if not child_template_instance:
-                try:
-                    child_template_instance = Template(
+            try:
+                self.children.append(
+                    self.registry.get(
                         child,
                         self.project_root,
                         self._get_relative_url(child),
                         self._s3_key_prefix,
+                        self.lazy,
                     )
-                except Exception:  # pylint: disable=broad-except
-                    LOG.debug("Traceback:", exc_info=True)
-                    LOG.error(f"Failed to add child template {child}")
-            if isinstance(child_template_instance, Template):
-                self.children.append(child_template_instance)
+                )
+            except Exception:  # pylint: disable=broad-except
+                LOG.debug("Traceback:", exc_info=True)
+                LOG.error(f"Failed to add child template {child}")
+
+    def child_template(self, logical_id: str) -> Optional["Template"]:
+        """returns the child template for an AWS::CloudFormation::Stack resource, or
+        None if the resource does not reference a template in the project"""
+        resource = self.template.get("Resources", {}).get(logical_id, {})
+        if resource.get("Type") != "AWS::CloudFormation::Stack":
+            return None
+        try:
+            path = _template_url_to_path(
+                resource["Properties"]["TemplateURL"], self.project_root
+            )
+        except Exception:  # pylint: disable=broad-except
+            return None
+        # remote templates aren't in the project, callers fall back to other means of
+        # finding them, so there's nothing to log here
+        if not path.is_file():
+            return None
+        for child in self.children:
+            if str(child.template_path) == str(path):
+                return child
+        return None
 
     @property
     def descendents(self) -> List["Template"]:
-        desc_map = {}
+        self._load_children()
+        return self.registry.graph.descendants(self)
 
-        def recurse(template):
-            for child in template.children:
-                desc_map[str(child.template_path)] = child
-                recurse(child)
-
-        recurse(self)
-
-        return list(desc_map.values())
+    @property
+    def ancestors(self) -> List["Template"]:
+        self._load_children()
+        return self.registry.graph.ancestors(self)
 
     def parameters(
         self
@@ -1,12 +1,13 @@
 import logging
+import threading
 import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from functools import partial
-from multiprocessing.dummy import Pool as ThreadPool
-from typing import Dict, List
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
 
 import boto3
 
-from taskcat._cfn.stack import Stack, Stacks, StackStatus, Tag
+from taskcat._cfn.stack import Events, Stack, Stacks, StackStatus, Tag
 from taskcat._client_factory import Boto3Cache
 from taskcat._common_utils import merge_dicts
 from taskcat._dataclasses import TestObj, TestRegion
@@ -15,17 +16,187 @@ from taskcat.exceptions import TaskCatException
 LOG = logging.getLogger(__name__)
 
 
-def fan_out(func, partial_kwargs, payload, threads):
-    pool = ThreadPool(threads)
+class _Batch:
+    """A single fan_out call. Items are claimed one at a time by whichever thread
+    gets to them first, the calling thread included, so a batch always makes
+    progress even when every pooled worker is busy with an outer batch."""
+
+    def __init__(self, func: Callable, items: list, key: Optional[Callable], limiter):
+        self.func = func
+        self.items = items
+        self.key = key
+        self.limiter = limiter
+        self.results: List[Any] = [None] * len(items)
+        self.errors: Dict[int, BaseException] = {}
+        self._next = 0
+        self._done = 0
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def _claim(self) -> Optional[int]:
+        with self._lock:
+            if self._next >= len(self.items):
+                return None
+            index = self._next
+            self._next += 1
+            return index
+
+    def _complete(self) -> None:
+        self._done += 1
+        if self._done == len(self.items):
+            self._finished.set()
+
+    def run(self) -> None:
+        index = self._claim()
+        while index is not None:
+            item = self.items[index]
+            try:
+                with self.limiter(self.key(item) if self.key else None):
+                    self.results[index] = self.func(item)
+            except Exception as e:  # pylint: disable=broad-except
+                self.errors[index] = e
+            except BaseException as e:
+                # eg. KeyboardInterrupt, stop rather than carry on with the rest
+                self.errors[index] = e
+                with self._lock:
+                    self._complete()
+                self.cancel()
+                raise
+            with self._lock:
+                self._complete()
+            index = self._claim()
+
+    def cancel(self) -> None:
+        with self._lock:
+            while self._next < len(self.items):
+                self.errors[self._next] = CancelledError()
+                self._next += 1
+                self._complete()
+
+    def wait(self) -> list:
+        self._finished.wait()
+        if self.errors:
+            raise self.errors[min(self.errors)]
+        return self.results
+
+
+class _KeyLimit:
+    def __init__(self, semaphore: Optional[threading.BoundedSemaphore]):
+        self._semaphore = semaphore
+
+    def __enter__(self):
+        if self._semaphore:
+            self._semaphore.acquire()
+
+    def __exit__(self, *args):
+        if self._semaphore:
+            self._semaphore.release()
+
+
+class FanOutExecutor:
+    """Long lived thread pool shared by all fan_out calls.
+
+    max_workers caps the number of pooled threads across all calls, and items that
+    are mapped with a key, eg. (account_id, region, service), are additionally
+    limited to key_limit concurrent calls per key. The limit for a service can be
+    overridden using service_limits, the service is taken from the last element of
+    the key. Keys should only be used for calls that don't fan out further, as a
+    nested call waiting on a key that its parent holds would never complete.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 32,
+        key_limit: int = 8,
+        service_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.max_workers = max_workers
+        self.key_limit = key_limit
+        self.service_limits = service_limits if service_limits else {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[Hashable, threading.BoundedSemaphore] = {}
+        self._batches: Set[_Batch] = set()
+        self._lock = threading.Lock()
+
+    def _limit(self, key: Optional[Hashable]) -> _KeyLimit:
+        if key is None:
+            return _KeyLimit(None)
+        with self._lock:
+            if key not in self._semaphores:
+                limit = self.key_limit
+                if isinstance(key, tuple) and key:
+                    limit = self.service_limits.get(key[-1], limit)
+                self._semaphores[key] = threading.BoundedSemaphore(limit)
+            return _KeyLimit(self._semaphores[key])
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if not self._executor:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="taskcat-fan-out"
+                )
+            return self._executor
+
+    def map(
+        self,
+        func: Callable,
+        payload,
+        threads: Optional[int] = None,
+        key: Optional[Callable[[Any], Hashable]] = None,
+    ) -> list:
+        """calls func for each item in payload, with at most threads items of this
+        call in flight at once, returning results in payload order"""
+        items = list(payload)
+        if not items:
+            return []
+        batch = _Batch(func, items, key, self._limit)
+        with self._lock:
+            self._batches.add(batch)
+        try:
+            in_flight = min(threads if threads else len(items), len(items))
+            executor = self._get_executor()
+            for _ in range(in_flight - 1):
+                executor.submit(batch.run)
+            batch.run()
+            return batch.wait()
+        finally:
+            with self._lock:
+                self._batches.discard(batch)
+
+    def cancel(self) -> None:
+        """cancels all items that have not yet started, map calls that had pending
+        items raise CancelledError once their running items have finished"""
+        with self._lock:
+            batches = list(self._batches)
+        for batch in batches:
+            batch.cancel()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.cancel()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait)
+
+
+FAN_OUT_EXECUTOR = FanOutExecutor()
+
+
+def fan_out(func, partial_kwargs, payload, threads, key=None):
     if partial_kwargs:
         func = partial(func, **partial_kwargs)
-    results = pool.map(func, payload)
-    pool.close()
-    pool.join()
-    return results
+    return FAN_OUT_EXECUTOR.map(func, payload, threads, key)
+
+
+def _stack_key(stack: Stack):
+    return stack.region.account_id, stack.region_name, "cloudformation"
 
 
-class Stacker:
+def _region_key(region: TestRegion):
+    return region.account_id, region.name, "cloudformation"
+
+
+class Stacker:  # pylint: disable=too-many-instance-attributes
 
     NULL_UUID = uuid.UUID(int=0)
 
@@ -36,6 +207,8 @@ class Stacker:
         uid: uuid.UUID = NULL_UUID,
         stack_name_prefix: str = "tCaT",
         tags: list = None,
+        fail_fast: bool = False,
+        no_delete: bool = False,
     ):
         self.tests = tests
         self.project_name = project_name
@@ -43,6 +216,14 @@ class Stacker:
         self.tags = tags if tags else []
         self.uid = uuid.uuid4() if uid == Stacker.NULL_UUID else uid
         self.stacks: Stacks = Stacks()
+        self.fail_fast = fail_fast
+        self.no_delete = no_delete
+        # set when there's no point waiting for the remaining stacks to complete
+        self.stop_waiting = False
+        self.failed_stack: Optional[Stack] = None
+        self.failed_stack_errors: Events = Events()
+        # ids of stacks deleted by fail_fast before they completed
+        self.cancelled_stacks: Set[str] = set()
 
     @staticmethod
     def _tests_to_list(tests: Dict[str, TestObj]):
@@ -73,7 +254,9 @@ class Stacker:
             "tags": tags,
             "test_name": test.name,
         }
-        stacks = fan_out(Stack.create, partial_kwargs, test.regions, threads)
+        stacks = fan_out(
+            Stack.create, partial_kwargs, test.regions, threads, key=_region_key
+        )
         self.stacks += stacks
 
     # Not used by tCat at present
@@ -83,36 +266,95 @@ class Stacker:
     def delete_stacks(self, criteria: dict = None, deep=False, threads=32):
         if deep:
             raise NotImplementedError("deep delete not yet implemented")
+        self._delete(self.stacks.filter(criteria), threads)
+
+    def _delete(self, stacks: Stacks, threads: int = 32):
         fan_out(
-            self._delete_stacks_per_client,
-            None,
-            self._group_stacks(self.stacks.filter(criteria)),
-            threads,
+            self._delete_stacks_per_client, None, self._group_stacks(stacks), threads
         )
 
     def _delete_stacks_per_client(self, stacks, threads=8):
-        fan_out(self._delete_stack, None, stacks["Stacks"], threads)
+        fan_out(self._delete_stack, None, stacks["Stacks"], threads, key=_stack_key)
 
     @staticmethod
     def _delete_stack(stack: Stack):
         stack.delete(stack_id=stack.id, client=stack.client)
         stack.refresh()
 
-    def status(self, recurse: bool = False, threads: int = 32, **kwargs):
+    def status(
+        self, recurse: bool = False, threads: int = 32, refresh: bool = False, **kwargs
+    ):
         if recurse:
             raise NotImplementedError("recurse not implemented")
         stacks = self.stacks.filter(kwargs)
         per_region_stacks = self._group_stacks(stacks)
-        results = fan_out(self._status_per_client, None, per_region_stacks, threads)
+        results = fan_out(
+            self._status_per_client, {"refresh": refresh}, per_region_stacks, threads
+        )
         statuses: Dict[str, dict] = {"IN_PROGRESS": {}, "COMPLETE": {}, "FAILED": {}}
         for region in results:
             for status in region:
                 statuses[status[1]][status[0]] = status[2]
+        if self.fail_fast and statuses["FAILED"] and not self.failed_stack:
+            self._abort(statuses["FAILED"], statuses["IN_PROGRESS"], threads)
+        if self.failed_stack:
+            # a cancelled stack's DELETE_COMPLETE doesn't mean its test passed
+            reason = f"cancelled after stack {self.failed_stack.name} failed"
+            for stack_id in self.cancelled_stacks & set(statuses["COMPLETE"]):
+                del statuses["COMPLETE"][stack_id]
+                statuses["FAILED"][stack_id] = reason
         return statuses
 
-    def _status_per_client(self, stacks, threads: int = 8):
+    def _abort(self, failed_ids, in_progress_ids, threads: int = 32):
+        """records the first failed stack and its error events, and starts deleting
+        all of the other stacks, unless stacks are not to be deleted, in which case
+        they are left as they are and waiting for them stops"""
+        failed = [s for s in self.stacks if s.id in failed_ids][0]
+        action = "leaving" if self.no_delete else "deleting"
+        LOG.error(
+            f"Stack {failed.name} in {failed.region_name} failed, {action} all "
+            f"other stacks"
+        )
+        self.failed_stack = failed
+        self.failed_stack_errors = failed.error_events(refresh=True)
+        for event in self.failed_stack_errors:
+            LOG.error(f"{event.logical_id} {event.status} {event.status_reason}")
+        if self.no_delete:
+            self.stop_waiting = True
+            return
+        remaining = Stacks(s for s in self.stacks if s is not failed)
+        self.cancelled_stacks = set(in_progress_ids)
+        self._delete(remaining, threads)
+
+    def _status_per_client(self, stacks, refresh: bool = False, threads: int = 8):
+        if refresh:
+            self._refresh_per_client(stacks)
         return fan_out(self._status, None, stacks["Stacks"], threads)
 
+    @staticmethod
+    def _refresh_per_client(stacks):
+        # a single paginated describe_stacks sweep returns every stack for the
+        # client's account and region, so there's no need for a call per stack.
+        # Deleted stacks can't change and aren't in the sweep, refreshing them
+        # would mean walking every page and then describing them by id.
+        pending: Dict[str, Stack] = {
+            stack.id: stack
+            for stack in stacks["Stacks"]
+            if stack.status != "DELETE_COMPLETE"
+        }
+        if not pending:
+            return
+        for page in stacks["Client"].get_paginator("describe_stacks").paginate():
+            for stack_props in page["Stacks"]:
+                stack = pending.pop(stack_props["StackId"], None)
+                if stack:
+                    stack.set_stack_properties(stack_properties=stack_props)
+            if not pending:
+                break
+        # deleted stacks are only returned when described by id
+        for stack in pending.values():
+            stack.set_stack_properties()
+
     @staticmethod
     def _status(stack: Stack):
         for status_group in ["COMPLETE", "IN_PROGRESS", "FAILED"]:
@@ -135,6 +377,7 @@ class Stacker:
             {"criteria": criteria},
             stacks["Stacks"],
             threads,
+            key=_stack_key,
         )
         return merge_dicts(results)
 
@@ -155,7 +398,11 @@ class Stacker:
 
     def _resources_per_client(self, stacks, criteria, threads: int = 8):
         results = fan_out(
-            self._resources, {"criteria": criteria}, stacks["Stacks"], threads
+            self._resources,
+            {"criteria": criteria},
+            stacks["Stacks"],
+            threads,
+            key=_stack_key,
         )
         return merge_dicts(results)
 
@@ -248,6 +495,7 @@ class Stacker:
             {"boto_cache": boto_cache, "profile": profile},
             regions,
             threads=len(regions),
+            key=lambda region: (profile, region, "cloudformation"),
         )
         return [stack for sublist in stacks for stack in sublist]
 
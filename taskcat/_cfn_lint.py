@@ -55,50 +55,88 @@ class Lint:
             lints[name] = {"regions": self._filter_unsupported_regions(test.regions)}
             lints[name]["template"] = self._templates[name].template_path
             lints[name]["results"] = {}
+        self._run_plan(self._plan(lints), lints, lint_errors)
+        for err in lint_errors:
+            LOG.error(err)
+        self._add_errors(lints, lint_errors)
+        return lints, lint_errors
+
+    def _plan(self, lints, template_paths=None):
+        """groups the tests by the templates they use and the regions they use them
+        in, so that each template is linted once per distinct set of regions.
+        Returns {(template path, regions): (template, [test names])}"""
+        plan = {}
+        for name in lints:
+            regions = frozenset(lints[name]["regions"])
+            template = self._templates[name]
+            for tmpl in [template] + template.descendents:
+                tpath = str(tmpl.template_path)
+                if template_paths is not None and tpath not in template_paths:
+                    continue
+                names = plan.setdefault((tpath, regions), (tmpl, []))[1]
+                if name not in names:
+                    names.append(name)
+        return plan
+
+    def _run_plan(self, plan, lints, lint_errors):
+        # cfn-lint decodes the template to find its rules, which don't depend on
+        # the regions
+        template_rules = {}
+        for (tpath, _), (template, names) in plan.items():
+            results = self._run_checks(
+                template, lints[names[0]]["regions"], lint_errors, template_rules
+            )
+            for name in names:
+                lints[name]["results"][tpath] = list(results)
 
-            templates = []
-            for template in self._templates.values():
-                templates.append(template)
-                templates += list(template.descendents)
-            templates = set(templates)
-            for template in templates:
-                self._run_checks(template, name, lint_errors, lints)
-            for err in lint_errors:
-                LOG.error(err)
+    def _add_errors(self, lints, lint_errors):
         for test in lints:
             for result in lints[test]["results"]:
                 if lints[test]["results"][result]:
                     if self._is_error(lints[test]["results"][result]):
                         lint_errors.add(result)
-        return lints, lint_errors
 
-    def _run_checks(self, template, name, lint_errors, lints):
+    def relint(self, template_paths):
+        """re-runs the checks for templates that have changed on disk, the templates
+        are expected to have been reloaded already"""
+        lints, lint_errors = self.lints
+        paths = {str(path) for path in template_paths}
+        lint_errors.difference_update(paths)
+        for name in lints:
+            for path in paths:
+                lints[name]["results"].pop(path, None)
+        self._run_plan(self._plan(lints, paths), lints, lint_errors)
+        self._add_errors(lints, lint_errors)
+
+    def _run_checks(self, template, regions, lint_errors, template_rules=None):
         tpath = str(template.template_path)
-        results = []
+        template_rules = {} if template_rules is None else template_rules
         try:
-            (_, rules, template_matches) = cfnlint.core.get_template_rules(
-                tpath, self._cfnlint_config
-            )
-            if template_matches:
-                results = template_matches
-            else:
-                results = cfnlint.core.run_checks(
-                    tpath, template.template, rules, lints[name]["regions"]
+            if tpath not in template_rules:
+                template_rules[tpath] = cfnlint.core.get_template_rules(
+                    tpath, self._cfnlint_config
                 )
-            lints[name]["results"][tpath] = results
+            (_, rules, template_matches) = template_rules[tpath]
+            if template_matches:
+                return template_matches
+            return cfnlint.core.run_checks(tpath, template.template, rules, regions)
         except cfnlint.core.CfnLintExitException as e:
             lint_errors.add(str(e))
-        lints[name]["results"][tpath] = results
+        return []
 
-    def output_results(self):
+    def output_results(self, template_paths=None):
         """
         Prints lint results to terminal using taskcat console formatting
 
+        :param template_paths: only print results for these templates
         :return:
         """
         lints = self.lints[0]
+        paths = {str(path) for path in template_paths or []}
         for test in lints:
             for result in lints[test]["results"]:
+                if template_paths and result not in paths:
+                    continue
                 if not lints[test]["results"][result]:
                     LOG.info(f"Lint passed for test {test} on template {result}")
                 else:
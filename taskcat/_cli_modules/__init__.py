@@ -4,3 +4,4 @@ from .lint import Lint  # noqa: F401
 from .list import List  # noqa: F401
 from .package import Package  # noqa: F401
 from .test import Test  # noqa: F401
+from .watch import Watch  # noqa: F401
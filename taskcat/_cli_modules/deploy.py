@@ -11,7 +11,7 @@ from taskcat._cfn.threaded import Stacker
 from taskcat._client_factory import Boto3Cache
 from taskcat._config import Config
 from taskcat._name_generator import generate_name
-from taskcat._s3_stage import stage_in_s3
+from taskcat._s3_stage import stage_in_s3, stage_include, stage_transfer_config
 from taskcat.exceptions import TaskCatException
 
 LOG = logging.getLogger(__name__)
@@ -90,9 +90,15 @@ class Deploy:
             if test_name != "default":
                 del config.config.tests[test_name]
         buckets = config.get_buckets(boto3_cache)
-        stage_in_s3(buckets, config.config.project.name, path)
-        regions = config.get_regions(boto3_cache)
         templates = config.get_templates(project_root=path)
+        stage_in_s3(
+            buckets,
+            config.config.project.name,
+            path,
+            include=stage_include(config, templates, path),
+            transfer_config=stage_transfer_config(config),
+        )
+        regions = config.get_regions(boto3_cache)
         parameters = config.get_rendered_parameters(buckets, regions, templates)
         tests = config.get_tests(path, templates, regions, buckets, parameters)
         tags = [Tag({"Key": "taskcat-installer", "Value": name})]
@@ -108,7 +114,7 @@ class Deploy:
                 f"waiting for stack {stacks.stacks[0].name} to complete in "
                 f"{stacks.stacks[0].region_name}"
             )
-            while stacks.status()["IN_PROGRESS"]:
+            while stacks.status(refresh=True)["IN_PROGRESS"]:
                 sleep(5)
         if stacks.status()["FAILED"]:
             LOG.error("Install failed:")
@@ -2,18 +2,20 @@
 # noqa: B950,F841
 import logging
 from pathlib import Path
-from typing import List as ListType
 
 import boto3
 
 from taskcat._cfn._log_stack_events import _CfnLogTools
-from taskcat._cfn.threaded import Stacker
+from taskcat._cfn._refresh import REFRESH_SCHEDULER
+from taskcat._cfn.threaded import FAN_OUT_EXECUTOR, Stacker, fan_out
 from taskcat._cfn_lint import Lint as TaskCatLint
 from taskcat._client_factory import Boto3Cache
 from taskcat._config import Config
+from taskcat._dataclasses import S3BucketObj
 from taskcat._generate_reports import ReportBuilder
 from taskcat._lambda_build import LambdaBuild
-from taskcat._s3_stage import stage_in_s3
+from taskcat._rate_limit import RATE_LIMITER
+from taskcat._s3_stage import stage_in_s3, stage_include, stage_transfer_config
 from taskcat._tui import TerminalPrinter
 from taskcat.exceptions import TaskCatException
 
@@ -36,6 +38,7 @@ class Test:
         no_delete: bool = False,
         lint_disable: bool = False,
         enable_sig_v2: bool = False,
+        fail_fast: bool = False,
     ):
         """tests whether CloudFormation templates are able to successfully launch
 
@@ -45,7 +48,32 @@ class Test:
         :param no_delete: don't delete stacks after test is complete
         :param lint_disable: disable cfn-lint checks
         :param enable_sig_v2: enable legacy sigv2 requests for auto-created buckets
+        :param fail_fast: delete other stacks as soon as one fails, unless no_delete
         """
+        # the scheduler and executor threads are shut down even if a step fails
+        try:
+            Test._run(
+                input_file,
+                project_root,
+                no_delete,
+                lint_disable,
+                enable_sig_v2,
+                fail_fast,
+            )
+        finally:
+            REFRESH_SCHEDULER.shutdown()
+            FAN_OUT_EXECUTOR.shutdown()
+            RATE_LIMITER.log_stats()
+
+    @staticmethod
+    def _run(  # pylint: disable=too-many-arguments
+        input_file: str,
+        project_root: str,
+        no_delete: bool,
+        lint_disable: bool,
+        enable_sig_v2: bool,
+        fail_fast: bool,
+    ):
         project_root_path: Path = Path(project_root).expanduser().resolve()
         input_file_path: Path = project_root_path / input_file
         config = Config.create(
@@ -67,14 +95,22 @@ class Test:
         LambdaBuild(config, project_root_path)
         # 3. s3 sync
         buckets = config.get_buckets(boto3_cache)
-        stage_in_s3(buckets, config.config.project.name, project_root_path)
+        stage_in_s3(
+            buckets,
+            config.config.project.name,
+            project_root_path,
+            include=stage_include(config, templates, project_root_path),
+            transfer_config=stage_transfer_config(config),
+        )
         # 4. launch stacks
         regions = config.get_regions(boto3_cache)
         parameters = config.get_rendered_parameters(buckets, regions, templates)
         tests = config.get_tests(
             project_root_path, templates, regions, buckets, parameters
         )
-        test_definition = Stacker(config.config.project.name, tests)
+        test_definition = Stacker(
+            config.config.project.name, tests, fail_fast=fail_fast, no_delete=no_delete
+        )
         test_definition.create_stacks()
         terminal_printer = TerminalPrinter()
         # 5. wait for completion
@@ -93,12 +129,16 @@ class Test:
         # TODO: summarise stack statusses (did they complete/delete ok) and print any
         #  error events
         # 8. delete buckets
-        deleted: ListType[str] = []
+        distinct_buckets = {}
         for test in buckets.values():
             for bucket in test.values():
-                if bucket.name not in deleted:
-                    bucket.delete(delete_objects=True)
-                    deleted.append(bucket.name)
+                distinct_buckets[bucket.name] = bucket
+        fan_out(
+            S3BucketObj.delete,
+            {"delete_objects": True},
+            distinct_buckets.values(),
+            len(distinct_buckets),
+        )
         # 9. raise if something failed
         if len(status["FAILED"]) > 0:
             raise TaskCatException(
@@ -0,0 +1,79 @@
+import logging
+from functools import partial
+from pathlib import Path
+
+from taskcat._cfn.threaded import FAN_OUT_EXECUTOR, fan_out
+from taskcat._cfn_lint import Lint as TaskCatLint
+from taskcat._client_factory import Boto3Cache
+from taskcat._config import Config
+from taskcat._dataclasses import S3BucketObj
+from taskcat._s3_stage import stage_in_s3, stage_include, stage_transfer_config
+from taskcat._watch import ProjectWatcher
+
+LOG = logging.getLogger(__name__)
+
+
+class Watch:
+    """[ALPHA] re-lints templates and re-stages files in S3 as they are changed"""
+
+    def __init__(
+        self,
+        input_file: str = ".taskcat.yml",
+        project_root: str = "./",
+        no_upload: bool = False,
+        wait: int = 1,
+    ):
+        """
+        :param input_file: path to project config
+        :param project_root: base path for project
+        :param no_upload: only lint changed templates, don't stage files in S3
+        :param wait: seconds to wait between checks for changed files
+        """
+        project_root_path: Path = Path(project_root).expanduser().resolve()
+        input_file_path: Path = project_root_path / input_file
+        config = Config.create(
+            project_root=project_root_path, project_config_path=input_file_path
+        )
+        templates = config.get_templates(project_root_path)
+        lint = TaskCatLint(config, templates)
+        lint.output_results()
+        buckets: dict = {}
+        watcher_args: dict = {}
+        if not no_upload:
+            buckets = config.get_buckets(Boto3Cache())
+            watcher_args["stage"] = partial(
+                self._stage, buckets, config, project_root_path
+            )
+            watcher_args["include"] = partial(
+                stage_include, config, project_root=project_root_path
+            )
+        watcher = ProjectWatcher(project_root_path, templates, lint, **watcher_args)
+        try:
+            watcher.watch(wait)
+        finally:
+            self._cleanup(buckets)
+
+    @staticmethod
+    def _stage(buckets, config, project_root, file_list):
+        stage_in_s3(
+            buckets,
+            config.config.project.name,
+            project_root,
+            transfer_config=stage_transfer_config(config),
+            file_list=file_list,
+        )
+
+    @staticmethod
+    def _cleanup(buckets):
+        distinct_buckets = {}
+        for test in buckets.values():
+            for bucket in test.values():
+                distinct_buckets[bucket.name] = bucket
+        if distinct_buckets:
+            fan_out(
+                S3BucketObj.delete,
+                {"delete_objects": True},
+                distinct_buckets.values(),
+                len(distinct_buckets),
+            )
+        FAN_OUT_EXECUTOR.shutdown()
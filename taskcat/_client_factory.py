@@ -7,6 +7,7 @@ from typing import Any, Dict, List
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError, ProfileNotFound
 
+from taskcat._rate_limit import RATE_LIMITER
 from taskcat.exceptions import TaskCatException
 
 LOG = logging.getLogger(__name__)
@@ -47,7 +48,10 @@ class Boto3Cache:
         region = self._get_region(region, profile)
         session = self.session(profile, region)
         return self._cache_lookup(
-            self._client_cache, [profile, region, service], session.client, [service]
+            self._client_cache,
+            [profile, region, service],
+            self._create_client,
+            [session, service, profile, region],
         )
 
     def resource(
@@ -58,10 +62,21 @@ class Boto3Cache:
         return self._cache_lookup(
             self._resource_cache,
             [profile, region, service],
-            session.resource,
-            [service],
+            self._create_resource,
+            [session, service, profile, region],
         )
 
+    @staticmethod
+    def _create_client(session, service, profile, region):
+        client = session.client(service)
+        return RATE_LIMITER.install(client, profile, region)
+
+    @staticmethod
+    def _create_resource(session, service, profile, region):
+        resource = session.resource(service)
+        RATE_LIMITER.install(resource.meta.client, profile, region)
+        return resource
+
     def partition(self, profile: str = "default") -> str:
         return self._cache_lookup(
             self._account_info, [profile], self._get_account_info, [profile]
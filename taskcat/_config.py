@@ -6,7 +6,8 @@ from typing import Dict, Optional, Union
 
 import yaml
 
-from taskcat._cfn.template import Template
+from taskcat._cfn._template_cache import TemplateCache
+from taskcat._cfn.template import TemplateRegistry, prefetch_templates
 from taskcat._client_factory import Boto3Cache
 from taskcat._common_utils import generate_bucket_name
 from taskcat._dataclasses import BaseConfig, RegionObj, S3BucketObj, TestObj, TestRegion
@@ -32,7 +33,16 @@ DEFAULTS = {
 
 
 class Config:
-    def __init__(self, sources: list, uid: uuid.UUID):
+    def __init__(
+        self,
+        sources: list,
+        uid: uuid.UUID,
+        template_registry: Optional[TemplateRegistry] = None,
+    ):
+        # templates are shared by everything created from this config
+        self.template_registry = (
+            template_registry if template_registry is not None else TemplateRegistry()
+        )
         self.config = BaseConfig.from_dict(DEFAULTS)
         self.config.set_source("TASKCAT_DEFAULT")
         self.uid = uid
@@ -60,6 +70,9 @@ class Config:
         project_source = cls._get_project_source(
             cls, project_config_path, project_root, template_file
         )
+        template_registry = TemplateRegistry(
+            cls._template_cache(project_source, project_root)
+        )
 
         # general
         sources = [
@@ -78,7 +91,7 @@ class Config:
             sources.append(
                 {
                     "source": str(template_file),
-                    "config": cls._dict_from_template(template_file),
+                    "config": cls._dict_from_template(template_file, template_registry),
                 }
             )
 
@@ -125,7 +138,16 @@ class Config:
         # cli arguments
         if args:
             sources.append({"source": "CliArgument", "config": args})
-        return cls(sources=sources, uid=uid)
+        return cls(sources=sources, uid=uid, template_registry=template_registry)
+
+    @staticmethod
+    def _template_cache(project_source, project_root) -> Optional[TemplateCache]:
+        # the registry is created before the config is merged, as the template's
+        # metadata can be part of the config, so only the project config is checked
+        config = (project_source or {}).get("config") or {}
+        if (config.get("project") or {}).get("template_cache"):
+            return TemplateCache(project_root / TemplateCache.CACHE_PATH)
+        return None
 
     # pylint: disable=protected-access
     @staticmethod
@@ -165,7 +187,9 @@ class Config:
         return config_dict
 
     @staticmethod
-    def _dict_from_template(file_path: Path) -> dict:
+    def _dict_from_template(
+        file_path: Path, template_registry: Optional[TemplateRegistry] = None
+    ) -> dict:
         relative_path = str(file_path.relative_to(PROJECT_ROOT))
         config_dict = (
             BaseConfig()
@@ -177,7 +201,13 @@ class Config:
         if not file_path.is_file():
             raise TaskCatException(f"invalid template path {file_path}")
         try:
-            template = Template(str(file_path)).template
+            template_registry = (
+                template_registry
+                if template_registry is not None
+                else TemplateRegistry()
+            )
+            # only the template's metadata is needed, not its children
+            template = template_registry.get(str(file_path), lazy=True).template
         except Exception as e:
             LOG.warning(f"failed to load template from {file_path}")
             LOG.debug(str(e), exc_info=True)
@@ -319,13 +349,29 @@ class Config:
             parameters[test_name] = template.parameters()
         return parameters
 
-    def get_templates(self, project_root: Path):
+    def get_templates(self, project_root: Path, lazy: bool = False):
+        """returns {test name: Template}, lazy templates are only decoded when their
+        content is used, for callers that only need their paths and s3 keys"""
+        if self.config.project.template_cache:
+            cache_dir = project_root / TemplateCache.CACHE_PATH
+            if self.template_registry.cache.cache_dir != cache_dir:
+                self.template_registry.cache = TemplateCache(cache_dir)
+        template_paths = {
+            test_name: project_root / test.template
+            for test_name, test in self.config.tests.items()
+        }
+        if not lazy:
+            # decodes all the templates up front, in parallel where it pays off
+            prefetch_templates(
+                template_paths.values(), project_root, self.template_registry.cache
+            )
         templates = {}
-        for test_name, test in self.config.tests.items():
-            templates[test_name] = Template(
-                template_path=project_root / test.template,
+        for test_name, template_path in template_paths.items():
+            templates[test_name] = self.template_registry.get(
+                template_path=template_path,
                 project_root=project_root,
                 s3_key_prefix=f"{self.config.project.name}/",
+                lazy=lazy,
             )
         return templates
 
@@ -1,6 +1,9 @@
 import json
 import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Dict, List, NewType, Optional, Union
@@ -65,6 +68,28 @@ METADATA = {
     "s3_object_acl": {
         "description": "ACL for uploaded s3 objects, defaults to 'private'"
     },
+    "s3_max_concurrency": {
+        "description": "Maximum number of concurrent S3 requests per bucket when "
+        "staging the project, defaults to 16"
+    },
+    "s3_max_bandwidth": {
+        "description": "Maximum bandwidth in MB/s to use for uploads to each "
+        "bucket when staging the project, defaults to unlimited"
+    },
+    "s3_stage_reachable_only": {
+        "description": "Only upload templates used by tests (including nested "
+        "templates and files they reference), Lambda zips and paths in "
+        "s3_stage_include, instead of the whole project"
+    },
+    "s3_stage_include": {
+        "description": "gitignore style patterns for additional files to upload "
+        "when s3_stage_reachable_only is enabled"
+    },
+    "template_cache": {
+        "description": "Cache parsed templates in .taskcat/template_cache in the "
+        "project root, so that unchanged templates are not parsed again on the next "
+        "run"
+    },
 }
 
 # types
@@ -220,31 +245,60 @@ class S3BucketObj:
         if error:
             raise error
 
-    def empty(self):
+    def empty(self, threads: int = 8):
+        """deletes all objects, object versions and delete markers in the bucket,
+        batches are deleted concurrently while the bucket is still being listed"""
         if not self.auto_generated:
             LOG.error(f"Will not empty bucket created outside of taskcat {self.name}")
             return
-        objects_to_delete = []
-        pages = self.s3_client.get_paginator("list_objects_v2").paginate(
+        start = time.monotonic()
+        # bounds the number of listed batches held in memory waiting to be deleted
+        slots = threading.BoundedSemaphore(threads * 2)
+        futures = []
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for batch in self._list_versions():
+                slots.acquire()
+                future = executor.submit(self._delete_batch, batch)
+                future.add_done_callback(lambda _: slots.release())
+                futures.append(future)
+        deleted = 0
+        errors: List[dict] = []
+        for future in futures:
+            batch_deleted, batch_errors = future.result()
+            deleted += batch_deleted
+            errors += batch_errors
+        elapsed = time.monotonic() - start
+        if deleted:
+            LOG.info(
+                f"Deleted {deleted} objects from {self.name} in {elapsed:.1f}s "
+                f"({deleted / max(elapsed, 0.001):.0f} objects/s)"
+            )
+        if errors:
+            for error in errors[:10]:
+                LOG.error(f"S3 delete error: {error}")
+            raise TaskCatException(
+                f"Failed to delete {len(errors)} objects from {self.name}"
+            )
+
+    def _list_versions(self):
+        """yields batches of up to 1000 keys, one per page of results"""
+        pages = self.s3_client.get_paginator("list_object_versions").paginate(
             Bucket=self.name
         )
         for page in pages:
-            objects = []
-            for obj in page.get("Contents", []):
-                del_obj = {"Key": obj["Key"]}
-                if obj.get("VersionId"):
-                    del_obj["VersionId"] = obj["VersionId"]
-                objects.append(del_obj)
-            objects_to_delete += objects
-        batched_objects = [
-            objects_to_delete[i : i + 1000]
-            for i in range(0, len(objects_to_delete), 1000)
-        ]
-        for objects in batched_objects:
-            if objects:
-                self.s3_client.delete_objects(
-                    Bucket=self.name, Delete={"Objects": objects}
-                )
+            batch = [
+                {"Key": obj["Key"], "VersionId": obj["VersionId"]}
+                for obj in page.get("Versions", []) + page.get("DeleteMarkers", [])
+            ]
+            if batch:
+                yield batch
+
+    def _delete_batch(self, objects):
+        response = self.s3_client.delete_objects(
+            Bucket=self.name, Delete={"Objects": objects, "Quiet": True}
+        )
+        errors = response.get("Errors", [])
+        return len(objects) - len(errors), errors
 
     def delete(self, delete_objects=False):
         if not self.auto_generated:
@@ -384,6 +438,21 @@ class ProjectConfig(JsonSchemaMixin, allow_additional_props=False):
     s3_object_acl: Optional[str] = field(
         default=None, metadata=METADATA["s3_object_acl"]
     )
+    s3_max_concurrency: Optional[int] = field(
+        default=None, metadata=METADATA["s3_max_concurrency"]
+    )
+    s3_max_bandwidth: Optional[float] = field(
+        default=None, metadata=METADATA["s3_max_bandwidth"]
+    )
+    s3_stage_reachable_only: Optional[bool] = field(
+        default=None, metadata=METADATA["s3_stage_reachable_only"]
+    )
+    s3_stage_include: Optional[List[str]] = field(
+        default=None, metadata=METADATA["s3_stage_include"]
+    )
+    template_cache: Optional[bool] = field(
+        default=None, metadata=METADATA["template_cache"]
+    )
 
 
 PROPAGATE_KEYS = ["tags", "parameters", "auth"]
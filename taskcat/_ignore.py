@@ -0,0 +1,131 @@
+import logging
+import re
+from pathlib import Path
+from typing import Iterable, List, Pattern, Tuple
+
+LOG = logging.getLogger(__name__)
+
+
+def _translate_class(pattern: str, start: int) -> Tuple[str, int]:
+    search = start + 1
+    if pattern[search : search + 1] == "!":
+        search += 1
+    # a "]" straight after the opening bracket is part of the class
+    end = pattern.find("]", search + 1)
+    if end == -1:
+        return re.escape("["), start + 1
+    body = pattern[start + 1 : end].replace("\\", "\\\\")
+    if body.startswith("!"):
+        body = "^" + body[1:]
+    elif body.startswith("^"):
+        body = "\\" + body
+    return "[" + body + "]", end + 1
+
+
+def _translate(pattern: str) -> str:
+    """translates a single gitignore glob, without leading or trailing slashes, into
+    a regular expression"""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        at_segment_start = i == 0 or pattern[i - 1] == "/"
+        if at_segment_start and pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif at_segment_start and pattern[i:] == "**":
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[":
+            part, i = _translate_class(pattern, i)
+            regex += part
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+class _Rule:
+    def __init__(self, regex: Pattern, negate: bool, dir_only: bool):
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+
+
+class ExclusionRules:
+    """Matches project relative paths against gitignore style patterns.
+
+    Patterns without a slash match a file or directory name at any depth, patterns
+    containing a slash are relative to the project root, a trailing slash only
+    matches directories, ``**`` matches any number of directories and a leading
+    ``!`` re-includes a path excluded by an earlier pattern. As with git, paths
+    inside an excluded directory can't be re-included, callers are expected to
+    prune excluded directories rather than descend into them.
+    """
+
+    FILE_NAME = ".taskcatignore"
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._rules: List[_Rule] = []
+        self.add(patterns)
+
+    @classmethod
+    def from_project(cls, project_root, defaults: Iterable[str] = ()):
+        """loads the project's .taskcatignore, patterns in it take precedence over
+        the defaults"""
+        rules = cls(defaults)
+        ignore_file = Path(project_root) / cls.FILE_NAME
+        if ignore_file.is_file():
+            LOG.debug(f"loading exclusions from {ignore_file}")
+            rules.add(ignore_file.read_text().splitlines())
+        return rules
+
+    def add(self, patterns: Iterable[str]) -> None:
+        for pattern in patterns:
+            rule = self._compile(pattern)
+            if rule:
+                self._rules.append(rule)
+
+    @staticmethod
+    def _compile(pattern: str):
+        pattern = pattern.rstrip("\n")
+        # trailing spaces are ignored unless escaped
+        if not pattern.endswith("\\ "):
+            pattern = pattern.rstrip(" ")
+        if not pattern or pattern.startswith("#"):
+            return None
+        negate = pattern.startswith("!")
+        if negate or pattern.startswith("\\!") or pattern.startswith("\\#"):
+            pattern = pattern[1:]
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if not pattern:
+            return None
+        anchored = "/" in pattern
+        body = _translate(pattern.lstrip("/"))
+        regex = "^" + body if anchored else "^(?:.*/)?" + body
+        return _Rule(re.compile(regex + "$"), negate, dir_only)
+
+    def excluded(self, relpath: str, is_dir: bool = False) -> bool:
+        """returns True if the path, relative to the project root and using forward
+        slashes, is excluded"""
+        return self.matches(relpath, is_dir)
+
+    def matches(self, relpath: str, is_dir: bool = False) -> bool:
+        """returns True if the path matches the patterns, for rules that list the
+        paths to include rather than exclude"""
+        relpath = relpath.strip("/")
+        for rule in reversed(self._rules):
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(relpath):
+                return not rule.negate
+        return False
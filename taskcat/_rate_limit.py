@@ -0,0 +1,203 @@
+import logging
+import threading
+from collections import deque
+from time import monotonic, sleep
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
+
+LOG = logging.getLogger(__name__)
+
+THROTTLING_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "BandwidthLimitExceeded",
+    "RequestThrottled",
+    "SlowDown",
+    "PriorRequestNotComplete",
+    "EC2ThrottledException",
+}
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in THROTTLING_CODES
+    if isinstance(error, S3UploadFailedError):
+        # boto3 wraps the ClientError, the code is only available in the message
+        return any(f"({code})" in str(error) for code in THROTTLING_CODES)
+    return False
+
+
+class TokenBucket:  # pylint: disable=too-many-instance-attributes
+    """Token bucket with an adaptive fill rate.
+
+    Calls aren't paced until the first time one is throttled, pacing then starts at
+    half the rate calls were made at during the preceding second. Each paced call
+    takes a token, calls made while the bucket is empty wait for the next token.
+    The rate is halved whenever a call is throttled and grows back by ``increase``
+    tokens per second with every successful call, up to ``max_rate``, or the rate
+    calls were throttled at if there is no ``max_rate``. Once calls haven't been
+    throttled for ``QUIET_PERIOD`` seconds the bucket goes back to how it started,
+    so a burst of throttling doesn't cap the rate for the rest of the run.
+    """
+
+    WINDOW = 1.0
+    QUIET_PERIOD = 60.0
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        min_rate: float = 0.5,
+        increase: float = 0.5,
+    ):
+        self.rate = rate
+        self.max_rate = max_rate
+        self._initial = (rate, max_rate)
+        self._throttled_at: Optional[float] = None
+        self.min_rate = min_rate
+        self.increase = increase
+        self.calls = 0
+        self.throttled = 0
+        self.delayed = 0
+        self.delay = 0.0
+        self._tokens = rate or 0.0
+        self._last = monotonic()
+        # times of the unpaced calls made during the last WINDOW seconds
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """takes a token, sleeping until one is available, returns the time waited"""
+        with self._lock:
+            now = monotonic()
+            self.calls += 1
+            if self.rate is None:
+                self._recent.append(now)
+                while self._recent[0] < now - self.WINDOW:
+                    self._recent.popleft()
+                return 0.0
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # the token is reserved up front, so concurrent callers queue up behind
+            # each other instead of all waking up at the same time
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if wait:
+                self.delayed += 1
+                self.delay += wait
+        if wait:
+            sleep(wait)
+        return wait
+
+    def throttle(self) -> None:
+        with self._lock:
+            self.throttled += 1
+            self._throttled_at = monotonic()
+            if self.rate is None:
+                observed = len(self._recent) / self.WINDOW
+                self._recent.clear()
+                if self.max_rate is None:
+                    self.max_rate = max(self.min_rate, observed)
+                self.rate = observed
+                self._tokens = 0.0
+                self._last = monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, self.rate)
+
+    def success(self) -> None:
+        with self._lock:
+            if self._throttled_at is not None and (
+                monotonic() - self._throttled_at >= self.QUIET_PERIOD
+            ):
+                self.rate, self.max_rate = self._initial
+                self._tokens = self.rate or 0.0
+                self._throttled_at = None
+            elif self.rate is not None:
+                self.rate = min(self.max_rate or self.rate, self.rate + self.increase)
+
+
+class AdaptiveRateLimiter:
+    """Keeps a TokenBucket per (account, region, service, operation) and paces the
+    calls made by boto3 clients that it has been installed on, once they have been
+    throttled. Tokens are taken per http request, so botocore's own retries are
+    paced as well."""
+
+    def __init__(
+        self,
+        max_rate: Optional[float] = None,
+        min_rate: float = 0.5,
+        increase: float = 0.5,
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key: Hashable) -> TokenBucket:
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(
+                    max_rate=self.max_rate,
+                    min_rate=self.min_rate,
+                    increase=self.increase,
+                )
+            return self._buckets[key]
+
+    def install(self, client: Any, account: str, region: str) -> Any:
+        """registers the limiter on a boto3 client's event hooks"""
+
+        def _key(event_name: str) -> Tuple[str, str, str, str]:
+            _, service, operation = event_name.split(".", 2)
+            return account, region, service, operation
+
+        def _before_send(event_name: str, **_):
+            self.bucket(_key(event_name)).acquire()
+
+        def _needs_retry(
+            event_name: str,
+            response: Optional[tuple] = None,
+            caught_exception: Optional[BaseException] = None,
+            **_,
+        ):
+            if caught_exception is not None or not response:
+                return
+            code = response[1].get("Error", {}).get("Code")
+            if code in THROTTLING_CODES:
+                LOG.debug(f"{_key(event_name)} throttled, reducing request rate")
+                self.bucket(_key(event_name)).throttle()
+            elif not code:
+                self.bucket(_key(event_name)).success()
+
+        client.meta.events.register("before-send", _before_send)
+        client.meta.events.register("needs-retry", _needs_retry)
+        return client
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {
+            "calls": sum(b.calls for b in buckets),
+            "throttled": sum(b.throttled for b in buckets),
+            "delayed": sum(b.delayed for b in buckets),
+            "delay": sum(b.delay for b in buckets),
+        }
+
+    def log_stats(self) -> None:
+        stats = self.stats()
+        if stats["throttled"] or stats["delayed"]:
+            LOG.info(
+                f"{stats['throttled']} of {stats['calls']} AWS API calls were "
+                f"throttled, {stats['delayed']} calls were delayed by a total of "
+                f"{stats['delay']:.1f} seconds"
+            )
+
+
+RATE_LIMITER = AdaptiveRateLimiter()
@@ -1,6 +1,11 @@
 import logging
+import re
+from pathlib import Path
+from typing import List, Optional, Set
 
-from taskcat._s3_sync import S3Sync
+from taskcat._cfn.threaded import fan_out
+from taskcat._ignore import ExclusionRules
+from taskcat._s3_sync import S3Sync, build_transfer_config
 from taskcat.exceptions import TaskCatException
 
 LOG = logging.getLogger(__name__)
@@ -21,13 +26,177 @@ class S3BucketCreatorException(TaskCatException):
     pass
 
 
-def stage_in_s3(buckets, project_name, project_root):
+def stage_include(config, templates, project_root) -> Optional[ExclusionRules]:
+    """returns the files to stage if the project only stages reachable files,
+    otherwise None"""
+    project = config.config.project
+    if not project.s3_stage_reachable_only:
+        return None
+    return reachable_files(
+        project_root, templates, project.lambda_zip_path, project.s3_stage_include
+    )
+
+
+def stage_transfer_config(config):
+    """returns the TransferConfig for the project's s3_max_concurrency and
+    s3_max_bandwidth settings"""
+    project = config.config.project
+    kwargs = {}
+    if project.s3_max_concurrency:
+        kwargs["max_concurrency"] = project.s3_max_concurrency
+    if project.s3_max_bandwidth:
+        kwargs["max_bandwidth"] = int(project.s3_max_bandwidth * 1024 ** 2)
+    return build_transfer_config(**kwargs)
+
+
+def reachable_files(
+    project_root, templates, lambda_zip_path=None, include=None
+) -> ExclusionRules:
+    """returns rules matching the files that tests need in s3: the tested templates,
+    their descendants, project files referenced by any of those templates and the
+    lambda zips of the project and its submodules, plus any include patterns"""
+    project_root = Path(project_root).expanduser().resolve()
+    patterns = [p for pattern in include or [] for p in _include_patterns(pattern)]
+    seen: Set[Path] = set()
+    for template in templates.values():
+        for tmpl in [template] + template.descendents:
+            if tmpl.template_path in seen:
+                continue
+            seen.add(tmpl.template_path)
+            patterns += _path_patterns(tmpl.template_path, project_root)
+            for path in _referenced_paths(tmpl.template, project_root):
+                patterns += _path_patterns(path, project_root)
+    if lambda_zip_path:
+        zip_path = _escape(lambda_zip_path.strip("/"))
+        patterns += [f"/{zip_path}/**", f"/submodules/**/{zip_path}/**"]
+    return ExclusionRules(patterns)
+
+
+def _include_patterns(pattern: str) -> List[str]:
+    # as with gitignore, a pattern matching a directory includes everything in it,
+    # a trailing slash only means it doesn't match files
+    negate = "!" if pattern.startswith("!") else ""
+    body = pattern[len(negate) :]
+    dir_only = body.endswith("/")
+    body = body.rstrip("/")
+    if not body or pattern.startswith("#"):
+        return [pattern]
+    if "/" not in body:
+        body = "**/" + body
+    contents = f"{negate}{body}/**"
+    return [contents] if dir_only else [pattern, contents]
+
+
+def _escape(relpath):
+    return re.sub(r"([*?\[\\])", r"\\\1", relpath)
+
+
+def _path_patterns(path, project_root) -> List[str]:
+    try:
+        relpath = _escape(str(Path(path).relative_to(project_root)))
+    except ValueError:
+        return []
+    return [f"/{relpath}/**"] if Path(path).is_dir() else [f"/{relpath}"]
+
+
+def _referenced_paths(node, project_root) -> Set[Path]:
+    """finds strings in a template that name a file or directory in the project,
+    eg. a script path in an Fn::Sub or Fn::Join"""
+    paths: Set[Path] = set()
+    if isinstance(node, dict):
+        for value in node.values():
+            paths |= _referenced_paths(value, project_root)
+    elif isinstance(node, list):
+        for value in node:
+            paths |= _referenced_paths(value, project_root)
+    elif isinstance(node, str):
+        paths |= _string_paths(node, project_root)
+    return paths
+
+
+def _string_paths(value, project_root) -> Set[Path]:
+    paths: Set[Path] = set()
+    # text around ${} substitutions, eg. "${QSS3KeyPrefix}scripts/bootstrap.sh"
+    for part in re.split(r"\$\{[^}]*\}", value):
+        part = part.strip("/")
+        if "/" not in part and "." not in part:
+            continue
+        try:
+            path = (project_root / part).resolve()
+            if path != project_root and path.exists():
+                paths.add(path)
+        except (OSError, ValueError):
+            continue
+    return paths
+
+
+def stage_in_s3(  # pylint: disable=too-many-arguments
+    buckets,
+    project_name,
+    project_root,
+    threads=16,
+    include=None,
+    transfer_config=None,
+    file_list=None,
+):
+    """syncs the project to every bucket, file_list can be passed in to re-use a
+    listing from S3Sync.get_local_file_list, in which case include is ignored"""
     distinct_buckets = {}
 
     for test in buckets.values():
         for bucket in test.values():
             distinct_buckets[bucket.name] = bucket
+    # the project is only walked and hashed once, and only uploaded to one bucket
+    # per partition, the other buckets in a partition are then copied server side
+    # from that bucket
+    if file_list is None:
+        file_list = S3Sync.get_local_file_list(project_root, include)
+    partitions: dict = {}
     for bucket in distinct_buckets.values():
-        S3Sync(
-            bucket.s3_client, bucket.name, project_name, project_root, bucket.object_acl
-        )
+        partitions.setdefault(bucket.partition, []).append(bucket)
+    fan_out(
+        _stage_partition,
+        {
+            "project_name": project_name,
+            "project_root": project_root,
+            "file_list": file_list,
+            "threads": threads,
+            "transfer_config": transfer_config,
+        },
+        list(partitions.values()),
+        len(partitions),
+    )
+
+
+def _stage_partition(  # pylint: disable=too-many-arguments
+    buckets, project_name, project_root, file_list, threads, transfer_config
+):
+    source, others = buckets[0], buckets[1:]
+    _sync_bucket(source, project_name, project_root, file_list, transfer_config)
+    fan_out(
+        _sync_bucket,
+        {
+            "project_name": project_name,
+            "project_root": project_root,
+            "file_list": file_list,
+            "source_bucket": source.name,
+            "transfer_config": transfer_config,
+        },
+        others,
+        threads,
+    )
+
+
+def _sync_bucket(  # pylint: disable=too-many-arguments
+    bucket, project_name, project_root, file_list, transfer_config, source_bucket=None
+):
+    S3Sync(
+        bucket.s3_client,
+        bucket.name,
+        project_name,
+        project_root,
+        bucket.object_acl,
+        file_list=file_list,
+        source_bucket=source_bucket,
+        transfer_config=transfer_config,
+    )
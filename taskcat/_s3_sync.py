@@ -1,24 +1,192 @@
-import fnmatch
 import hashlib
+import json
 import logging
+import mmap
 import os
+import random
+import threading
 import time
-from functools import partial
-from multiprocessing.dummy import Pool as ThreadPool
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional
 
 from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
+from s3transfer.manager import TransferConfig, TransferManager
+from s3transfer.subscribers import BaseSubscriber
 
+from taskcat._ignore import ExclusionRules
 from taskcat._logger import PrintMsg
+from taskcat._rate_limit import is_throttling_error
 from taskcat.exceptions import TaskCatException
 
 LOG = logging.getLogger(__name__)
 
+PART_SIZE = 8 * 1024 * 1024
+# below this, starting a process pool takes longer than hashing on a single core
+PARALLEL_HASH_MIN_BYTES = 64 * 1024 * 1024
+
+
+def _hash_tasks(file_path, chunk_size=PART_SIZE):
+    size = os.path.getsize(file_path)
+    return [
+        (file_path, offset, min(chunk_size, size - offset))
+        for offset in range(0, size, chunk_size)
+    ]
+
+
+def _md5_range(task):
+    file_path, offset, length = task
+    with open(file_path, "rb") as file_handle:
+        with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            with memoryview(data) as view, view[offset : offset + length] as part:
+                return hashlib.md5(part).digest()  # nosec
+
+
+def _etag(digests):
+    # This is a bit funky because of the way multipart upload etags are done, they
+    # are a md5 of the md5's from each part with the number of parts appended
+    # credit to hyperknot https://github.com/aws/aws-cli/issues/2585#issue-226758933
+    if not digests:
+        return '"{}"'.format(hashlib.md5(b"").hexdigest())  # nosec
+    if len(digests) == 1:
+        return '"{}"'.format(digests[0].hex())
+    digests_md5 = hashlib.md5(b"".join(digests))  # nosec
+    return '"{}-{}"'.format(digests_md5.hexdigest(), len(digests))
+
+
+def build_transfer_config(max_concurrency=16, max_bandwidth=None) -> TransferConfig:
+    """returns the TransferConfig used for syncs, max_bandwidth is in bytes per
+    second across all concurrent transfers in a sync"""
+    # objects have to be split into the same parts as the local etags are calculated
+    # with, s3transfer uses multipart for files of exactly the threshold size, which
+    # would give a single part etag of "<md5>-1"
+    return TransferConfig(
+        multipart_threshold=PART_SIZE + 1,
+        multipart_chunksize=PART_SIZE,
+        max_request_concurrency=max_concurrency,
+        max_bandwidth=max_bandwidth,
+    )
+
+
+def _is_access_denied(error):
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") == "AccessDenied"
+    return isinstance(error, S3UploadFailedError) and "(AccessDenied)" in str(error)
+
+
+class _TransferProgress(BaseSubscriber):
+    """totals the bytes transferred by a sync and periodically logs progress"""
+
+    LOG_INTERVAL = 10.0
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.transferred = 0
+        self._start = time.monotonic()
+        self._last_log = self._start
+        self._lock = threading.Lock()
+
+    def on_progress(self, future, bytes_transferred, **kwargs):
+        with self._lock:
+            self.transferred += bytes_transferred
+            now = time.monotonic()
+            if now - self._last_log < self.LOG_INTERVAL:
+                return
+            self._last_log = now
+            transferred = self.transferred
+        LOG.info(
+            f"transferred {transferred / 1024 ** 2:.1f} of "
+            f"{self.total_bytes / 1024 ** 2:.1f} MB "
+            f"({self._rate(transferred, now) / 1024 ** 2:.1f} MB/s)"
+        )
+
+    def _rate(self, transferred, now):
+        elapsed = now - self._start
+        return transferred / elapsed if elapsed > 0 else 0.0
+
+    def log_summary(self):
+        now = time.monotonic()
+        LOG.debug(
+            f"transferred {self.transferred / 1024 ** 2:.1f} MB in "
+            f"{now - self._start:.1f}s "
+            f"({self._rate(self.transferred, now) / 1024 ** 2:.1f} MB/s)"
+        )
+
+
+class HashCache:
+    """Persists file checksums between runs, so that unchanged files do not need to
+    be hashed again. Entries are keyed on the path relative to the project root and
+    are only used if the file's size, mtime and inode all still match."""
+
+    CACHE_PATH = Path(".taskcat/hash_cache.json")
+    # files modified this recently may be changed again within the filesystem's
+    # mtime resolution, without their mtime changing, so aren't cached
+    MIN_AGE_NS = 2 * 10 ** 9
+
+    def __init__(self, project_root):
+        self.path = Path(project_root) / self.CACHE_PATH
+        self._entries: Dict[str, list] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as cache_file:
+                self._entries = json.load(cache_file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            LOG.debug(f"ignoring unreadable hash cache {self.path}: {e}")
+
+    @staticmethod
+    def _stat_key(stat: os.stat_result) -> list:
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def get(self, relpath: str, stat: os.stat_result) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(relpath)
+        if entry and entry[:3] == self._stat_key(stat):
+            return entry[3]
+        return None
+
+    def set(self, relpath: str, stat: os.stat_result, checksum: str):
+        if time.time() * 10 ** 9 - stat.st_mtime_ns < self.MIN_AGE_NS:
+            return
+        with self._lock:
+            self._entries[relpath] = self._stat_key(stat) + [checksum]
+            self._dirty = True
+
+    def prune(self, relpaths):
+        """drops entries for files that no longer exist"""
+        with self._lock:
+            for relpath in set(self._entries) - set(relpaths):
+                del self._entries[relpath]
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w") as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            LOG.debug(f"failed to write hash cache {self.path}: {e}")
+
 
 class S3Sync:
     """Syncronizes local project files with S3 based on checksums.
 
-    Excludes hidden files, unpackaged lambda source and taskcat /ci/ files.
+    Excludes hidden files, unpackaged lambda source and taskcat /ci/ files, as well
+    as anything matched by a .taskcatignore file in the project root.
     Uses the Etag as an md5 which introduces the following limitations
         * Uses undocumented etag algorithm for multipart uploads
         * Does not work wil files uploaded in the console that use SSE encryption
@@ -28,83 +196,173 @@ class S3Sync:
     Does not support buckets with versioning enabled
     """
 
-    # TODO: better exclusions that support path wildcards, eg. "*/.git/*"
-    exclude_files = [".*", "*.md"]
-    exclude_path_prefixes = ["functions/source/", ".", "venv/", "taskcat_outputs/"]
+    # gitignore style patterns, extended by the project's .taskcatignore
+    exclude_patterns = [
+        ".*",
+        "*.md",
+        "/functions/source/",
+        "/venv/",
+        "/taskcat_outputs/",
+        "node_modules/",
+    ]
 
     exclude_remote_path_prefixes: List[str] = []
 
-    def __init__(self, s3_client, bucket, prefix, path, acl="private"):
+    # records the remote state after each sync, so that the next sync doesn't need to
+    # list the whole prefix
+    MANIFEST_NAME = ".taskcat-manifest.json"
+    MANIFEST_VERSION = 1
+    # objects checked against the manifest, to catch objects that have been deleted
+    # or overwritten since, eg. by a lifecycle rule
+    MANIFEST_SPOT_CHECKS = 5
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        s3_client,
+        bucket,
+        prefix,
+        path,
+        acl="private",
+        file_list=None,
+        source_bucket=None,
+        transfer_config=None,
+    ):
         """Syncronizes local file system with an s3 bucket/prefix
 
+        file_list can be passed in to re-use a listing from get_local_file_list. If
+        source_bucket is set, it must already have been synced with the same files,
+        and changed files are copied from it instead of being uploaded.
+        transfer_config overrides the concurrency and bandwidth used for transfers.
         """
         if prefix != "" and not prefix.endswith("/"):
             prefix = prefix + "/"
         self.s3_client = s3_client
-        file_list = self._get_local_file_list(path)
-        s3_file_list = self._get_s3_file_list(bucket, prefix)
-        self._sync(file_list, s3_file_list, bucket, prefix, acl=acl)
+        self.transfer_config = transfer_config or build_transfer_config()
+        if file_list is None:
+            file_list = self._get_local_file_list(path)
+        s3_file_list = self._read_manifest(bucket, prefix)
+        has_manifest = s3_file_list is not None
+        if not has_manifest:
+            s3_file_list = self._get_s3_file_list(bucket, prefix)
+        changed = self._sync(
+            file_list,
+            s3_file_list,
+            bucket,
+            prefix,
+            acl=acl,
+            source_bucket=source_bucket,
+            has_manifest=has_manifest,
+        )
+        if changed or not has_manifest:
+            self._write_manifest(bucket, prefix, file_list, s3_file_list)
+
+    @staticmethod
+    def get_local_file_list(path, include=None):
+        """returns {relative path: [absolute path, etag]} for all files to be synced,
+        if include rules are given, only files they match are synced"""
+        return S3Sync._get_local_file_list(path, include=include)
+
+    @staticmethod
+    def update_local_file_list(path, file_list, relpaths):
+        """updates a listing from get_local_file_list in place for files that have
+        been added, changed or removed. relpaths are expected to already have been
+        checked against the exclusions."""
+        path = os.path.abspath(os.path.expanduser(path))
+        for relpath in relpaths:
+            full_path = path + "/" + relpath
+            if os.path.isfile(full_path):
+                file_list[relpath] = [full_path, None]
+            else:
+                file_list.pop(relpath, None)
+        hash_cache = HashCache(path)
+        S3Sync._hash_pending(file_list, hash_cache)
+        hash_cache.save()
+        return file_list
 
     @staticmethod
-    def _hash_file(file_path, chunk_size=8 * 1024 * 1024):
-        # This is a bit funky because of the way multipart upload etags are done, they
-        # are a md5 of the md5's from each part with the number of parts appended
-        # credit to hyperknot https://github.com/aws/aws-cli/issues/2585#issue-226758933
-        md5s = []
-
-        with open(file_path, "rb") as file_handle:
-            while True:
-                data = file_handle.read(chunk_size)
-                if not data:
-                    break
-                md5s.append(hashlib.md5(data))  # nosec
-
-        if len(md5s) == 1:
-            return '"{}"'.format(md5s[0].hexdigest())
-
-        digests = b"".join(m.digest() for m in md5s)
-        digests_md5 = hashlib.md5(digests)  # nosec
-        return '"{}-{}"'.format(digests_md5.hexdigest(), len(md5s))
+    def _hash_file(file_path, chunk_size=PART_SIZE):
+        return _etag([_md5_range(task) for task in _hash_tasks(file_path, chunk_size)])
+
+    @staticmethod
+    def _hash_files(file_paths, chunk_size=PART_SIZE):
+        """hashes a batch of files, spreading the parts of all files across a pool of
+        processes when there's enough data for it to pay off"""
+        tasks = {path: _hash_tasks(path, chunk_size) for path in file_paths}
+        all_tasks = [task for path in file_paths for task in tasks[path]]
+        total_size = sum(task[2] for task in all_tasks)
+        workers = os.cpu_count() or 1
+        digests = None
+        if workers > 1 and total_size >= PARALLEL_HASH_MIN_BYTES:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    digests = list(executor.map(_md5_range, all_tasks, chunksize=4))
+            except (OSError, BrokenProcessPool) as e:
+                LOG.debug(f"parallel hashing failed, falling back to serial: {e}")
+        if digests is None:
+            digests = [_md5_range(task) for task in all_tasks]
+        checksums = []
+        start = 0
+        for path in file_paths:
+            end = start + len(tasks[path])
+            checksums.append(_etag(digests[start:end]))
+            start = end
+        return checksums
 
     # TODO: refactor
-    def _get_local_file_list(
-        self, path, include_checksums=True
-    ):  # pylint: disable=too-many-locals
+    @staticmethod
+    def _get_local_file_list(path, include_checksums=True, include=None):
         file_list = {}
         # get absolute local path
         path = os.path.abspath(os.path.expanduser(path))
+        hash_cache = HashCache(path) if include_checksums else None
+        exclusions = ExclusionRules.from_project(path, S3Sync.exclude_patterns)
         # recurse through directories
-        for root, _, files in os.walk(path):
+        for root, dirs, files in os.walk(path):
             relpath = os.path.relpath(root, path) + "/"
-            exclude_path = False
             # relative path should be blank if there are no sub directories
             if relpath == "./":
                 relpath = ""
-            # exclude defined paths
-            for prefix in S3Sync.exclude_path_prefixes:
-                if relpath.startswith(prefix):
-                    exclude_path = True
-                    break
-            if not exclude_path:
-                file_list.update(
-                    self._iterate_files(files, root, include_checksums, relpath)
+            # prune excluded directories so that os.walk doesn't descend into them
+            dirs[:] = [d for d in dirs if not exclusions.excluded(relpath + d, True)]
+            file_list.update(
+                S3Sync._iterate_files(
+                    files, root, include_checksums, relpath, hash_cache, exclusions
                 )
+            )
+        walked = list(file_list)
+        if include:
+            file_list = {k: v for k, v in file_list.items() if include.matches(k)}
+        if include_checksums:
+            S3Sync._hash_pending(file_list, hash_cache)
+        if hash_cache:
+            hash_cache.prune(walked)
+            hash_cache.save()
         return file_list
 
-    def _iterate_files(self, files, root, include_checksums, relpath):
+    @staticmethod
+    def _hash_pending(file_list, hash_cache=None):
+        pending = [relpath for relpath, f in file_list.items() if f[1] is None]
+        stats = {relpath: os.stat(file_list[relpath][0]) for relpath in pending}
+        checksums = S3Sync._hash_files([file_list[relpath][0] for relpath in pending])
+        for relpath, checksum in zip(pending, checksums):
+            file_list[relpath][1] = checksum
+            if hash_cache:
+                hash_cache.set(relpath, stats[relpath], checksum)
+
+    @staticmethod
+    def _iterate_files(  # pylint: disable=too-many-arguments
+        files, root, include_checksums, relpath, hash_cache=None, exclusions=None
+    ):
         file_list = {}
         for file in files:
-            exclude = False
-            # exclude defined filename patterns
-            for pattern in S3Sync.exclude_files:
-                if fnmatch.fnmatch(file, pattern):
-                    exclude = True
-                    break
-            if not exclude:
+            if not exclusions or not exclusions.excluded(relpath + file):
                 full_path = root + "/" + file
                 if include_checksums:
-                    # get checksum
-                    checksum = self._hash_file(full_path)
+                    # files that aren't cached are hashed in one batch once the
+                    # walk is done
+                    checksum = None
+                    if hash_cache:
+                        checksum = hash_cache.get(relpath + file, os.stat(full_path))
                 else:
                     checksum = ""
                 file_list[relpath + file] = [full_path, checksum]
@@ -129,7 +387,8 @@ class S3Sync:
                 for file in resp["Contents"]:
                     # strip the prefix from the path
                     relpath = file["Key"][len(prefix) :]
-                    objects[relpath] = file["ETag"]
+                    if relpath != self.MANIFEST_NAME:
+                        objects[relpath] = file["ETag"]
             if "NextContinuationToken" in resp.keys():
                 continuation_token = resp["NextContinuationToken"]
             # If there's no toke in the response we've fetched all the objects
@@ -137,6 +396,68 @@ class S3Sync:
                 is_paginated = False
         return objects
 
+    def _read_manifest(self, bucket, prefix) -> Optional[Dict[str, str]]:
+        """returns the remote {path: etag} map recorded by the last sync, or None if
+        there's no usable manifest"""
+        try:
+            response = self.s3_client.get_object(
+                Bucket=bucket, Key=prefix + self.MANIFEST_NAME
+            )
+            manifest = json.loads(response["Body"].read())
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ["NoSuchKey", "AccessDenied"]:
+                raise
+            return None
+        except ValueError:
+            LOG.debug(f"ignoring unreadable manifest in s3://{bucket}/{prefix}")
+            return None
+        if (
+            not isinstance(manifest, dict)
+            or manifest.get("Version") != self.MANIFEST_VERSION
+            or manifest.get("Prefix") != prefix
+            or not isinstance(manifest.get("Objects"), dict)
+        ):
+            LOG.debug(f"ignoring stale manifest in s3://{bucket}/{prefix}")
+            return None
+        if not self._manifest_matches(bucket, prefix, manifest["Objects"]):
+            LOG.info(
+                f"s3://{bucket}/{prefix} changed outside of taskcat, listing all "
+                f"objects"
+            )
+            return None
+        return manifest["Objects"]
+
+    def _manifest_matches(self, bucket, prefix, objects) -> bool:
+        """checks a random sample of the manifest's objects against s3"""
+        count = min(len(objects), self.MANIFEST_SPOT_CHECKS)
+        sample = random.sample(sorted(objects), count)  # nosec
+        for relpath in sample:
+            try:
+                response = self.s3_client.head_object(
+                    Bucket=bucket, Key=prefix + relpath
+                )
+            except ClientError as e:
+                LOG.debug(f"spot check of {prefix + relpath} failed: {e}")
+                return False
+            if response.get("ETag") != objects[relpath]:
+                return False
+        return True
+
+    def _write_manifest(self, bucket, prefix, local_list, s3_list):
+        objects = {k: v for k, v in s3_list.items() if self._exclude_remote(k)}
+        objects.update({k: v[1] for k, v in local_list.items()})
+        manifest = {
+            "Version": self.MANIFEST_VERSION,
+            "Prefix": prefix,
+            "Objects": objects,
+        }
+        self.s3_client.put_object(
+            Bucket=bucket,
+            Key=prefix + self.MANIFEST_NAME,
+            Body=json.dumps(manifest).encode("utf-8"),
+            ContentType="application/json",
+        )
+
     @staticmethod
     def _exclude_remote(path):
         keep = False
@@ -147,9 +468,17 @@ class S3Sync:
         return keep
 
     # TODO: refactor
-    def _sync(
-        self, local_list, s3_list, bucket, prefix, acl, threads=16
-    ):  # pylint: disable=too-many-locals
+    def _sync(  # pylint: disable=too-many-locals,too-many-arguments
+        self,
+        local_list,
+        s3_list,
+        bucket,
+        prefix,
+        acl,
+        source_bucket=None,
+        has_manifest=False,
+    ):
+        """applies local changes to s3, returns True if anything was changed"""
         # determine which files to remove from S3
         remove_from_s3 = []
         for s3_file in s3_list.keys():
@@ -159,6 +488,13 @@ class S3Sync:
                     extra={"nametag": PrintMsg.S3DELETE},
                 )
                 remove_from_s3.append({"Key": prefix + s3_file})
+        upload_to_s3 = self._files_to_upload(local_list, s3_list, bucket)
+        if not remove_from_s3 and not upload_to_s3:
+            return False
+        # the manifest is removed until the sync completes, so that a failed sync
+        # falls back to listing the prefix next time
+        if has_manifest:
+            self.s3_client.delete_object(Bucket=bucket, Key=prefix + self.MANIFEST_NAME)
         # deleting objects, max 1k objects per s3 delete_objects call
         for objects in [
             remove_from_s3[i : i + 1000] for i in range(0, len(remove_from_s3), 1000)
@@ -170,7 +506,67 @@ class S3Sync:
                 for error in response["Errors"]:
                     LOG.error("S3 delete error: %s" % str(error))
                 raise TaskCatException("Failed to delete one or more files from S3")
-        # build list of files to upload
+        if source_bucket:
+            sources = {item[2]: item[2] for item in upload_to_s3}
+            self._transfer(
+                upload_to_s3,
+                prefix,
+                acl,
+                self._copy_sources(source_bucket, prefix, sources),
+            )
+        else:
+            # identical files, eg. submodules vendored more than once, are uploaded
+            # once and then copied server side
+            first, second, sources = self._deduplicate(
+                upload_to_s3, local_list, s3_list
+            )
+            copy_sources = self._copy_sources(bucket, prefix, sources)
+            self._transfer(first, prefix, acl, copy_sources)
+            self._transfer(second, prefix, acl, copy_sources)
+        return True
+
+    @staticmethod
+    def _deduplicate(upload_to_s3, local_list, s3_list):
+        """splits the files to upload by content, returns the files to transfer
+        first, the files to transfer once those have completed and
+        {relative path: relative path of an object with the same content to copy}
+
+        Files with the same content as an object that is already in the bucket, and
+        is being kept, are copied from it straight away. Otherwise the first file
+        with each checksum is uploaded and the rest are copied from it afterwards.
+        """
+        remote = {}
+        for relpath, (_, checksum) in local_list.items():
+            if checksum and s3_list.get(relpath) == checksum:
+                remote.setdefault(checksum, relpath)
+        first, second = [], []
+        uploaded: Dict[str, str] = {}
+        sources = {}
+        for item in upload_to_s3:
+            checksum = local_list[item[2]][1]
+            if checksum in remote:
+                sources[item[2]] = remote[checksum]
+                first.append(item)
+            elif checksum in uploaded:
+                sources[item[2]] = uploaded[checksum]
+                second.append(item)
+            else:
+                if checksum:
+                    uploaded[checksum] = item[2]
+                first.append(item)
+        if sources:
+            LOG.debug(f"copying {len(sources)} duplicate files instead of uploading")
+        return first, second, sources
+
+    @staticmethod
+    def _copy_sources(bucket, prefix, sources):
+        return {
+            relpath: {"Bucket": bucket, "Key": prefix + source}
+            for relpath, source in sources.items()
+        }
+
+    @staticmethod
+    def _files_to_upload(local_list, s3_list, bucket):
         upload_to_s3 = []
         for local_file in local_list:
             upload = False
@@ -184,36 +580,90 @@ class S3Sync:
                 absolute_path = local_list[local_file][0]
                 s3_path = local_file
                 upload_to_s3.append([absolute_path, bucket, s3_path])
-        # multithread the uploading of files
-        pool = ThreadPool(threads)
-        func = partial(
-            self._s3_upload_file, prefix=prefix, s3_client=self.s3_client, acl=acl
-        )
-        pool.map(func, upload_to_s3)
-        pool.close()
-        pool.join()
+        return upload_to_s3
+
+    def _transfer(self, items, prefix, acl, copy_sources=None):
+        """uploads items through a single TransferManager, so that concurrency and
+        bandwidth are capped across the whole sync rather than per file. Items with
+        an entry in copy_sources, keyed on their relative path, are copied server
+        side from that bucket/key instead."""
+        if not items:
+            return
+        copy_sources = dict(copy_sources or {})
+        # largest first, so that a big file doesn't end up transferring on its own
+        # after everything else has finished
+        items = sorted(items, key=lambda item: os.path.getsize(item[0]), reverse=True)
+        progress = _TransferProgress(sum(os.path.getsize(item[0]) for item in items))
+        attempts: Dict[str, int] = {}
+        with TransferManager(self.s3_client, self.transfer_config) as manager:
+            while items:
+                futures = []
+                for item in items:
+                    source = copy_sources.get(item[2])
+                    futures.append(
+                        (
+                            item,
+                            self._submit(manager, item, prefix, acl, source, progress),
+                        )
+                    )
+                items = self._failed_transfers(futures, copy_sources, attempts)
+        progress.log_summary()
 
     @staticmethod
-    def _s3_upload_file(paths, prefix, s3_client, acl):
-        local_filename, bucket, s3_path = paths
-        retry = 0
-        # backoff and retry
-        while retry < 5:
+    def _submit(
+        manager, item, prefix, acl, copy_source, progress
+    ):  # pylint: disable=too-many-arguments
+        local_filename, bucket, s3_path = item
+        key = prefix + s3_path
+        if copy_source:
             LOG.info(
-                f"s3://{bucket}/{prefix + s3_path}", extra={"nametag": PrintMsg.S3}
+                f"s3://{copy_source['Bucket']}/{copy_source['Key']} -> "
+                f"s3://{bucket}/{key}",
+                extra={"nametag": PrintMsg.S3},
             )
+            # managed copies are split into the same parts as uploads, so the copy's
+            # etag matches the local checksum
+            return manager.copy(
+                copy_source,
+                bucket,
+                key,
+                extra_args={"ACL": acl},
+                subscribers=[progress],
+            )
+        LOG.info(f"s3://{bucket}/{key}", extra={"nametag": PrintMsg.S3})
+        return manager.upload(
+            local_filename, bucket, key, extra_args={"ACL": acl}, subscribers=[progress]
+        )
+
+    @staticmethod
+    def _failed_transfers(futures, copy_sources, attempts):
+        """waits for a round of transfers, returns the items that should be retried"""
+        retry_items = []
+        backoff = 0
+        for item, future in futures:
             try:
-                s3_client.upload_file(
-                    local_filename, bucket, prefix + s3_path, ExtraArgs={"ACL": acl}
-                )
-                break
+                future.result()
+                continue
             except Exception as e:  # pylint: disable=broad-except
-                retry += 1
-                LOG.error("S3 upload error: %s" % e)
-                # give up if we've exhausted retries, or if the error is not-retryable
-                # ie. AccessDenied
-                if retry == 5 or (
-                    isinstance(e, S3UploadFailedError) and "(AccessDenied)" in str(e)
-                ):
-                    raise TaskCatException("Failed to upload to S3")
-                time.sleep(retry * 2)
+                error = e
+            if item[2] in copy_sources and isinstance(error, ClientError):
+                # eg. the source bucket is in another account that doesn't grant
+                # access
+                LOG.debug(f"copy of {item[2]} failed, uploading instead: {error}")
+                del copy_sources[item[2]]
+                retry_items.append(item)
+                continue
+            LOG.error("S3 upload error: %s" % error)
+            attempts[item[2]] = attempts.get(item[2], 0) + 1
+            # give up if we've exhausted retries, or if the error is not-retryable
+            # ie. AccessDenied
+            if attempts[item[2]] == 5 or _is_access_denied(error):
+                raise TaskCatException("Failed to upload to S3")
+            # throttled requests have already slowed down the client's rate
+            # limiter, retrying straight away just queues for the next token
+            if not is_throttling_error(error):
+                backoff = max(backoff, attempts[item[2]] * 2)
+            retry_items.append(item)
+        if backoff:
+            time.sleep(backoff)
+        return retry_items
@@ -19,12 +19,12 @@ class TerminalPrinter:
 
     def report_test_progress(self, stacker: TaskcatStacker, poll_interval=10):
         _status_dict = stacker.status()
-        while self._is_test_in_progress(_status_dict):
+        while self._is_test_in_progress(_status_dict) and not stacker.stop_waiting:
             for stack in stacker.stacks:
                 self._print_stack_tree(stack, buffer=self.buffer)
             time.sleep(poll_interval)
             self.buffer.clear()
-            _status_dict = stacker.status()
+            _status_dict = stacker.status(refresh=True)
 
         self._display_final_status(stacker)
 
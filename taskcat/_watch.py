@@ -0,0 +1,181 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from taskcat._cfn.template import Template
+from taskcat._ignore import ExclusionRules
+from taskcat._s3_sync import S3Sync
+from taskcat.exceptions import TaskCatException
+
+LOG = logging.getLogger(__name__)
+
+
+class ProjectWatcher:
+    """Keeps a project's templates, lint results and local file checksums in memory
+    and polls the project for changes. Only changed templates are reloaded and
+    re-linted, and only changed files are re-hashed and staged.
+
+    :param lint: a taskcat._cfn_lint.Lint for the templates, or None to skip linting
+    :param stage: called with the local file list whenever files change, or None to
+    skip staging
+    :param include: called with the templates, returns the include rules to stage
+    with, or None to stage all files
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        project_root: Path,
+        templates: Dict[str, Template],
+        lint=None,
+        stage: Optional[Callable[[dict], None]] = None,
+        include: Optional[Callable[[dict], Optional[ExclusionRules]]] = None,
+    ):
+        self.project_root = Path(project_root).expanduser().resolve()
+        self.templates = templates
+        self.lint = lint
+        self.file_list: Optional[dict] = None
+        self._stage = stage
+        self._include = include
+        self._exclusions = ExclusionRules.from_project(
+            self.project_root, S3Sync.exclude_patterns
+        )
+        self._snapshot = self.snapshot()
+
+    def snapshot(self) -> Dict[str, Tuple[int, int, int]]:
+        """returns {relative path: (size, mtime, inode)} for all files that aren't
+        excluded from staging"""
+        files = {}
+        root_path = str(self.project_root)
+        for root, dirs, names in os.walk(root_path):
+            relpath = os.path.relpath(root, root_path) + "/"
+            if relpath == "./":
+                relpath = ""
+            dirs[:] = [
+                d for d in dirs if not self._exclusions.excluded(relpath + d, True)
+            ]
+            for name in names:
+                if self._exclusions.excluded(relpath + name):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                files[relpath + name] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        return files
+
+    def changes(self) -> Set[str]:
+        """returns the relative paths of files added, changed or removed since the
+        last call"""
+        current = self.snapshot()
+        changed = {
+            path
+            for path in set(current) | set(self._snapshot)
+            if current.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = current
+        return changed
+
+    def _template_index(self) -> Dict[Path, List[Template]]:
+        # the same file can be loaded more than once, eg. with different s3 key
+        # prefixes
+        index: Dict[Path, List[Template]] = {}
+        for template in self.templates.values():
+            for instance in [template] + template.descendents:
+                instances = index.setdefault(instance.template_path, [])
+                if not any(instance is i for i in instances):
+                    instances.append(instance)
+        return index
+
+    def affected_tests(self, changed: Set[str]) -> List[str]:
+        """returns the names of the tests whose templates, or nested templates, are
+        among the changed files"""
+        registries = {id(t.registry): t.registry for t in self.templates.values()}
+        affected: Set[str] = set()
+        for registry in registries.values():
+            for relpath in changed:
+                path = self.project_root / relpath
+                affected.update(registry.graph.affected_tests(path, self.templates))
+        return sorted(affected)
+
+    @staticmethod
+    def _reload(template: Template) -> bool:
+        try:
+            template.reload()
+            return True
+        except Exception as e:  # pylint: disable=broad-except
+            LOG.debug("Traceback:", exc_info=True)
+            LOG.error(f"Failed to reload {template.template_path}: {e}")
+            return False
+
+    def reload_templates(self, changed: Set[str]) -> Set[Path]:
+        """reloads changed templates, and the parents of removed templates, returns
+        the paths of the templates that need to be re-linted"""
+        index = self._template_index()
+        paths = {self.project_root / relpath for relpath in changed}
+        relint = set()
+        for path in paths & set(index):
+            if path.is_file():
+                for template in index[path]:
+                    if self._reload(template):
+                        relint.add(path)
+                continue
+            # a removed child is dropped by reloading its parents
+            parents = [
+                parent
+                for template in index[path]
+                for parent in template.registry.graph.parents(template)
+            ]
+            for parent in parents:
+                if parent.template_path not in paths and self._reload(parent):
+                    relint.add(parent.template_path)
+        # templates that a reloaded template started to include
+        relint.update(set(self._template_index()) - set(index))
+        return relint
+
+    def update_file_list(self, changed: Set[str]) -> dict:
+        include = self._include(self.templates) if self._include else None
+        if include is not None or self.file_list is None:
+            # which files are reachable can change with any template, so the
+            # listing is rebuilt, unchanged files still come from the hash cache
+            file_list = S3Sync.get_local_file_list(self.project_root, include)
+            self.file_list = file_list
+            return file_list
+        return S3Sync.update_local_file_list(self.project_root, self.file_list, changed)
+
+    def update(self, changed: Optional[Set[str]] = None) -> bool:
+        """re-lints and stages anything affected by changed files, returns True if
+        there were any changes"""
+        changed = self.changes() if changed is None else changed
+        if not changed:
+            return False
+        start = time.perf_counter()
+        LOG.info(f"{len(changed)} files changed: {', '.join(sorted(changed)[:5])}")
+        tests = self.affected_tests(changed)
+        if tests:
+            LOG.info(f"affected tests: {', '.join(tests)}")
+        relint = self.reload_templates(changed)
+        if self.lint and relint:
+            self.lint.relint(relint)
+            self.lint.output_results(relint)
+        if self._stage:
+            self._stage(self.update_file_list(changed))
+        LOG.info(f"updated in {time.perf_counter() - start:.2f}s")
+        return True
+
+    def watch(self, interval: float = 1.0, iterations: Optional[int] = None):
+        """stages the project, then polls for changes until interrupted, or for
+        iterations polls"""
+        if self._stage:
+            self._stage(self.update_file_list(set()))
+        LOG.info(f"watching {self.project_root} for changes")
+        count = 0
+        while iterations is None or count < iterations:
+            time.sleep(interval)
+            try:
+                self.update()
+            except TaskCatException as e:
+                # keep watching, the next change may well fix it
+                LOG.error(str(e))
+            count += 1
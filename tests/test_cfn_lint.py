@@ -5,6 +5,7 @@ from pathlib import Path
 
 import yaml
 
+import cfnlint.core
 import mock
 from taskcat._cfn_lint import Lint
 from taskcat._config import Config
@@ -274,3 +275,48 @@ class TestCfnLint(unittest.TestCase):
             shutil.rmtree("/tmp/lint_test_output/")
             os.chdir(cwd)
             pass
+
+    def test_relint(self):
+        test_proj = (Path(__file__).parent / "./data/nested-fail").resolve()
+        config = Config.create(
+            project_config_path=test_proj / ".taskcat.yml", project_root=test_proj
+        )
+        templates = config.get_templates(project_root=test_proj)
+        lint = Lint(config=config, templates=templates)
+        before = {
+            k: list(v) for k, v in lint.lints[0]["taskcat-json"]["results"].items()
+        }
+        errors = set(lint.lints[1])
+        path = templates["taskcat-json"].template_path
+        with mock.patch.object(lint, "_run_checks", wraps=lint._run_checks) as m_run:
+            lint.relint({path})
+        m_run.assert_called_once()
+        self.assertEqual(str(path), str(m_run.call_args[0][0].template_path))
+        after = lint.lints[0]["taskcat-json"]["results"]
+        self.assertEqual(set(before), set(after))
+        self.assertEqual(
+            [str(m) for m in before[str(path)]], [str(m) for m in after[str(path)]]
+        )
+        self.assertEqual(errors, lint.lints[1])
+
+    def test_lint_plan(self):
+        project = (Path(__file__).parent / "./data/nested-stacks").resolve()
+        config = Config.create(
+            project_config_path=project / ".taskcat.yml", project_root=project
+        )
+        templates = config.get_templates(project_root=project)
+        with mock.patch("cfnlint.core.run_checks", return_value=[]) as m_run:
+            with mock.patch(
+                "cfnlint.core.get_template_rules", wraps=cfnlint.core.get_template_rules
+            ) as m_rules:
+                lint = Lint(config=config, templates=templates)
+        # parent.yaml and child.yaml in two sets of regions, standalone.yaml in one
+        self.assertEqual(5, m_run.call_count)
+        self.assertEqual(3, m_rules.call_count)
+        paths = {str(project / "templates" / n) for n in ["parent.yaml", "child.yaml"]}
+        for test in ["one", "two", "three"]:
+            self.assertEqual(paths, set(lint.lints[0][test]["results"]))
+        self.assertEqual(
+            {str(project / "templates" / "standalone.yaml")},
+            set(lint.lints[0]["standalone"]["results"]),
+        )
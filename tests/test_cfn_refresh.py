@@ -0,0 +1,75 @@
+import threading
+import unittest
+from datetime import timedelta
+
+import mock
+from taskcat._cfn._refresh import RefreshScheduler
+
+
+def make_stack(event=None):
+    stack = mock.Mock()
+    if event:
+        stack.refresh.side_effect = lambda: event.set()
+    return stack
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    def test_schedule(self):
+        scheduler = RefreshScheduler(resolution=0.01)
+        refreshed = threading.Event()
+        stack = make_stack(refreshed)
+        scheduler.schedule(stack, timedelta(0))
+        self.assertTrue(refreshed.wait(5))
+        stack.refresh.assert_called_once()
+        scheduler.shutdown()
+
+    def test_reschedule_replaces_pending(self):
+        scheduler = RefreshScheduler()
+        stack = make_stack()
+        first = scheduler.schedule(stack, timedelta(seconds=60))
+        second = scheduler.schedule(stack, timedelta(seconds=60))
+        self.assertTrue(first.cancelled)
+        self.assertFalse(second.cancelled)
+        self.assertEqual(1, scheduler.pending)
+        scheduler.cancel(stack)
+        self.assertTrue(second.cancelled)
+        self.assertEqual(0, scheduler.pending)
+        scheduler.shutdown()
+
+    @mock.patch(
+        "taskcat._cfn._refresh.monotonic",
+        side_effect=[100.1 + i / 100 for i in range(10)],
+    )
+    def test_coalesce(self, _):
+        scheduler = RefreshScheduler(resolution=0.5)
+        scheduler._start = mock.Mock()
+        for _ in range(10):
+            scheduler.schedule(make_stack(), timedelta(seconds=60))
+        due = {entry.due for _, _, entry in scheduler._heap}
+        self.assertEqual(1, len(due))
+        scheduler.shutdown()
+
+    def test_cancelled_not_refreshed(self):
+        scheduler = RefreshScheduler(resolution=0.01)
+        stack = make_stack()
+        handle = scheduler.schedule(stack, timedelta(seconds=0.05))
+        handle.cancel()
+        refreshed = threading.Event()
+        scheduler.schedule(make_stack(refreshed), timedelta(seconds=0.1))
+        self.assertTrue(refreshed.wait(5))
+        stack.refresh.assert_not_called()
+        scheduler.shutdown()
+
+    def test_shutdown(self):
+        scheduler = RefreshScheduler()
+        stack = make_stack()
+        handle = scheduler.schedule(stack, timedelta(seconds=60))
+        scheduler.shutdown()
+        self.assertTrue(handle.cancelled)
+        self.assertEqual(0, scheduler.pending)
+        self.assertIsNone(scheduler._thread)
+        # scheduler restarts on demand
+        refreshed = threading.Event()
+        scheduler.schedule(make_stack(refreshed), timedelta(0))
+        self.assertTrue(refreshed.wait(5))
+        scheduler.shutdown()
@@ -2,10 +2,10 @@ import unittest
 import uuid
 from datetime import datetime
 from pathlib import Path
-from threading import Timer
 
 import mock
 from taskcat import Config
+from taskcat._cfn._refresh import ScheduledRefresh
 from taskcat._cfn.stack import (
     Event,
     Events,
@@ -79,6 +79,24 @@ class TestEvent(unittest.TestCase):
         expected = "<Event object {} at {}>".format("test_event_id", hex(id(event)))
         self.assertEqual(expected, event.__repr__())
 
+    def test_event_is_compact(self):
+        event_dict = event_template.copy()
+        event_dict["ResourceProperties"] = '{"TemplateURL": "https://test/t.yaml"}'
+        event = Event(event_dict)
+        self.assertFalse(hasattr(event, "__dict__"))
+        # properties are only decoded when accessed
+        self.assertIsNone(event._properties)
+        self.assertEqual(event.properties, {"TemplateURL": "https://test/t.yaml"})
+        self.assertIs(event.properties, event._properties)
+        self.assertTrue(criteria_matches({"status": "CREATE_IN_PROGRESS"}, event))
+        self.assertTrue(
+            criteria_matches(
+                {"properties": {"TemplateURL": "https://test/t.yaml"}}, event
+            )
+        )
+        with self.assertRaises(ValueError):
+            criteria_matches({"_raw_properties": ""}, event)
+
 
 class TestResource(unittest.TestCase):
     def test_resource(self):
@@ -166,6 +184,40 @@ class TestFilterableList(unittest.TestCase):
         filtered = tags.filter(key="my_key", value="my_value")
         self.assertEqual(filtered, tags)
 
+    def test_indexed_filter(self):
+        def make_event(event_id, status):
+            event = event_template.copy()
+            event.update(
+                {
+                    "EventId": event_id,
+                    "ResourceStatus": status,
+                    "LogicalResourceId": "a",
+                }
+            )
+            return Event(event)
+
+        events = Events(
+            [make_event("1", "CREATE_FAILED"), make_event("2", "CREATE_COMPLETE")]
+        )
+        filtered = events.filter(status="CREATE_FAILED")
+        self.assertEqual(["1"], [e.event_id for e in filtered])
+        self.assertIn("status", events._indexes)
+        filtered = events.filter(status="CREATE_FAILED", logical_id="b")
+        self.assertEqual([], filtered)
+        # indexes are invalidated on mutation
+        events.append(make_event("3", "CREATE_FAILED"))
+        self.assertEqual({}, events._indexes)
+        filtered = events.filter(status="CREATE_FAILED")
+        self.assertEqual(["1", "3"], [e.event_id for e in filtered])
+        events += [make_event("4", "CREATE_FAILED")]
+        filtered = events.filter({"status": "CREATE_FAILED"})
+        self.assertEqual(["1", "3", "4"], [e.event_id for e in filtered])
+        del events[0]
+        filtered = events.filter({"status": "CREATE_FAILED"})
+        self.assertEqual(["3", "4"], [e.event_id for e in filtered])
+        with self.assertRaises(ValueError):
+            events.filter(status="CREATE_FAILED", invalid="blah")
+
 
 def mock_client_method(*args, **kwargs):
     m_client = mock.Mock()
@@ -174,49 +226,63 @@ def mock_client_method(*args, **kwargs):
             "StackId": "arn:aws:cloudformation:us-east-1:123456789012:stack/"
             "SampleStack/e722ae60-fe62-11e8-9a0e-0ae8cc519968"
         }
-        m_client.describe_stacks.return_value = {
-            "Stacks": [
-                {
-                    "Tags": [{"Key": "tag_key", "Value": "tag_value"}],
-                    "Parameters": [
-                        {"ParameterKey": "MyParam", "ParameterValue": "MyVal"}
-                    ],
-                    "Outputs": [
-                        {"OutputKey": "MyOutput", "OutputValue": "MyOutputValue"}
-                    ],
-                    "StackStatus": "CREATE_IN_PROGRESS",
-                }
-            ]
+        stack_ids = {
+            "SampleStack": "arn:aws:cloudformation:us-east-1:123456789012:stack/"
+            "SampleStack/e722ae60-fe62-11e8-9a0e-0ae8cc519968",
+            "Child": "arn:aws:cloudformation:us-east-1:123456789012:stack/Child/"
+            "e722ae60-fe62-11e8-9a0e-0ae8cc519969",
+            "GrandChild": "arn:aws:cloudformation:us-east-1:123456789012:stack/"
+            "GrandChild/e722ae60-fe62-11e8-9a0e-0ae8cc519970",
+        }
+        nested_stacks = {
+            stack_ids["SampleStack"]: stack_ids["Child"],
+            stack_ids["Child"]: stack_ids["GrandChild"],
         }
 
+        def describe_stacks(StackName):
+            return {
+                "Stacks": [
+                    {
+                        "StackId": StackName,
+                        "Tags": [{"Key": "tag_key", "Value": "tag_value"}],
+                        "Parameters": [
+                            {"ParameterKey": "MyParam", "ParameterValue": "MyVal"}
+                        ],
+                        "Outputs": [
+                            {"OutputKey": "MyOutput", "OutputValue": "MyOutputValue"}
+                        ],
+                        "StackStatus": "CREATE_IN_PROGRESS",
+                    }
+                ]
+            }
+
+        m_client.describe_stacks.side_effect = describe_stacks
+
         class Paging:
             def __init__(self, api):
                 self._api = api
 
             def paginate(self, **kwargs):
-                if self._api == "describe_stacks":
-                    return [
+                if self._api == "list_stack_resources":
+                    resources = [
                         {
-                            "Stacks": [
-                                {
-                                    "StackId": "arn:aws:cloudformation:us-east-1:"
-                                    "123456789012:stack/Child/e722ae60-fe62-11e8-"
-                                    "9a0e-0ae8cc519969",
-                                    "ParentId": "arn:aws:cloudformation:us-east-1:"
-                                    "123456789012:stack/SampleStack/e722ae60-fe62-"
-                                    "11e8-9a0e-0ae8cc519968",
-                                },
-                                {
-                                    "StackId": "arn:aws:cloudformation:us-east-1:"
-                                    "123456789012:stack/GrandChild/e722ae60-fe62-11e8-"
-                                    "9a0e-0ae8cc519970",
-                                    "ParentId": "arn:aws:cloudformation:us-east-1:"
-                                    "123456789012:stack/Child/e722ae60-fe62-11e8-"
-                                    "9a0e-0ae8cc519969",
-                                },
-                            ]
+                            "LogicalResourceId": "Bucket",
+                            "ResourceType": "AWS::S3::Bucket",
+                            "ResourceStatus": "CREATE_COMPLETE",
                         }
                     ]
+                    if kwargs["StackName"] in nested_stacks:
+                        resources.append(
+                            {
+                                "LogicalResourceId": "ChildStack",
+                                "PhysicalResourceId": nested_stacks[
+                                    kwargs["StackName"]
+                                ],
+                                "ResourceType": "AWS::CloudFormation::Stack",
+                                "ResourceStatus": "CREATE_IN_PROGRESS",
+                            }
+                        )
+                    return [{"StackResourceSummaries": resources}]
                 raise NotImplementedError(self._api)
 
         m_client.get_paginator = Paging
@@ -265,10 +331,8 @@ class TestStack(unittest.TestCase):
     def test_create(self, m_s3_url_maker):
         region = make_test_region_obj("us-west-2")
         stack = Stack.create(region, "stack_name", make_test_template())
-        self.assertIsInstance(stack._timer, Timer)
-        # disabled due to a concurrency issue with the tests
-        # self.assertEqual(stack._timer.is_alive(), True)
-        stack._timer.cancel()
+        self.assertIsInstance(stack._refresh_handle, ScheduledRefresh)
+        stack._refresh_handle.cancel()
         m_s3_url_maker.assert_called_once()
 
     @mock.patch(
@@ -280,13 +344,13 @@ class TestStack(unittest.TestCase):
         region.client = mock_client_method
         m_template = make_test_template()
         stack = Stack.create(region, "stack_name", m_template)
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         no_outp = len(stack.outputs)
         no_params = len(stack.parameters)
         no_tags = len(stack.tags)
         # re-invoke timer function manually to check for idempotence
         stack.set_stack_properties()
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         self.assertEqual(len(stack.outputs), no_outp)
         self.assertEqual(len(stack.parameters), no_params)
         self.assertEqual(len(stack.tags), no_tags)
@@ -308,7 +372,7 @@ class TestStack(unittest.TestCase):
             "test_test",
             mock.Mock(),
         )
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         self.assertEqual(stack.name, "SampleStack")
 
     @mock.patch(
@@ -323,7 +387,7 @@ class TestStack(unittest.TestCase):
         region = make_test_region_obj("us-west-2")
         m_template = make_test_template()
         stack = Stack.create(region, "stack_name", m_template)
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
 
         m_prop.reset_mock()
         stack.refresh()
@@ -362,7 +426,7 @@ class TestStack(unittest.TestCase):
         region = make_test_region_obj("us-west-2")
         m_template = make_test_template()
         stack = Stack.create(region, "stack_name", m_template)
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         generic_evnt = event_template.copy()
         not_generic_evnt = event_template.copy()
         generic_evnt["ResourceStatusReason"] = "Resource creation cancelled"
@@ -388,7 +452,7 @@ class TestStack(unittest.TestCase):
         region = make_test_region_obj("us-west-2")
         m_template = make_test_template()
         stack = Stack.create(region, "stack_name", m_template)
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         stack.client = mock.Mock()
 
         class Paging:
@@ -411,6 +475,49 @@ class TestStack(unittest.TestCase):
         stack.client.get_paginator.assert_called_once()
         self.assertEqual(len(stack._events), 1)
 
+    @mock.patch(
+        "taskcat._cfn.stack.s3_url_maker",
+        return_value="https://test.s3.amazonaws.com/prefix/object",
+    )
+    def test_fetch_stack_events_incremental(self, _):
+        region = make_test_region_obj("us-west-2")
+        m_template = make_test_template()
+        stack = Stack.create(region, "stack_name", m_template)
+        stack._refresh_handle.cancel()
+        stack.client = mock.Mock()
+
+        def make_event(event_id):
+            event = event_template.copy()
+            event["EventId"] = event_id
+            return event
+
+        pages = [
+            {"StackEvents": [make_event("5"), make_event("4")]},
+            {"StackEvents": [make_event("3"), make_event("2")]},
+            {"StackEvents": [make_event("1")]},
+        ]
+        fetched_pages = []
+
+        class Paging:
+            @staticmethod
+            def paginate(**kwargs):
+                for page in pages:
+                    fetched_pages.append(page)
+                    yield page
+
+        stack.client.get_paginator.return_value = Paging()
+        stack._events = Events([Event(make_event("3")), Event(make_event("2"))])
+        stack._events.append(Event(make_event("1")))
+        stack._fetch_stack_events()
+        self.assertEqual(["5", "4", "3", "2", "1"], [e.event_id for e in stack._events])
+        self.assertEqual(2, len(fetched_pages))
+
+        fetched_pages.clear()
+        stack._events = Events([Event(make_event("4"))])
+        stack._fetch_stack_events(full=True)
+        self.assertEqual(["5", "4", "3", "2", "1"], [e.event_id for e in stack._events])
+        self.assertEqual(3, len(fetched_pages))
+
     @mock.patch(
         "taskcat._cfn.stack.s3_url_maker",
         return_value="https://test.s3.amazonaws.com/prefix/object",
@@ -420,7 +527,7 @@ class TestStack(unittest.TestCase):
         region = make_test_region_obj("us-west-2")
         m_template = make_test_template()
         stack = Stack.create(region, "stack_name", m_template)
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         stack._resources = Resources([Resource("test_stack_id", resource_template)])
 
         stack.resources()
@@ -443,7 +550,7 @@ class TestStack(unittest.TestCase):
         region = make_test_region_obj("us-west-2")
         m_template = make_test_template()
         stack = Stack.create(region, "stack_name", m_template)
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         stack.client = mock.Mock()
 
         class Paging:
@@ -475,7 +582,7 @@ class TestStack(unittest.TestCase):
         region = make_test_region_obj("us-west-2")
         m_template = make_test_template()
         stack = Stack.create(region, "stack_name", m_template)
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
         stack.client = mock.Mock()
 
         stack.refresh.reset_mock()
@@ -496,7 +603,7 @@ class TestStack(unittest.TestCase):
         )
         templates = c.get_templates(project_root=test_proj)
         stack = Stack.create(region, "stack_name", templates["taskcat-json"])
-        stack._timer.cancel()
+        stack._refresh_handle.cancel()
 
         child = event_template.copy()
         grandchild = event_template.copy()
@@ -520,3 +627,10 @@ class TestStack(unittest.TestCase):
 
         desc = stack.descendants()
         self.assertEqual(len(desc), 2)
+        # child templates are resolved from the parent template, not from events
+        m_evnts.assert_not_called()
+        middle = templates["taskcat-json"].children[0]
+        self.assertIs(desc[0].template, middle)
+        self.assertEqual(
+            desc[1].template.template_path.name, "test.template_inner.yaml"
+        )
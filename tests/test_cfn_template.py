@@ -1,7 +1,16 @@
+import shutil
 import unittest
 from pathlib import Path
+from tempfile import mkdtemp
 
+import mock
 from taskcat import Config
+from taskcat._cfn._template_cache import TemplateCache
+from taskcat._cfn.template import Template, TemplateRegistry, prefetch_templates
+from taskcat.exceptions import TaskCatException
+
+# nested.yaml includes child.yaml and parent.yaml, which includes child.yaml as well
+PROJECT = (Path(__file__).parent / "./data/nested-stacks").resolve()
 
 
 class TestCfnTemplate(unittest.TestCase):
@@ -14,3 +23,158 @@ class TestCfnTemplate(unittest.TestCase):
         template = templates["taskcat-json"]
         self.assertEqual(1, len(template.children))
         self.assertEqual(4, len(template.descendents))
+
+    def test_child_template(self):
+        test_proj = (Path(__file__).parent / "./data/nested-fail").resolve()
+        c = Config.create(
+            project_config_path=test_proj / ".taskcat.yml", project_root=test_proj
+        )
+        template = c.get_templates(project_root=test_proj)["taskcat-json"]
+        child = template.child_template("ChildStack")
+        self.assertIs(child, template.children[0])
+        self.assertIsNone(template.child_template("NotAResource"))
+
+    def test_child_template_remote(self):
+        template = Template(PROJECT / "templates" / "remote.yaml", PROJECT)
+        # remote templates are found from the stack's events, without logging errors
+        with mock.patch("taskcat._cfn.template.LOG") as m_log:
+            self.assertIsNone(template.child_template("Remote"))
+            self.assertIs(template.children[0], template.child_template("Child"))
+        m_log.error.assert_not_called()
+
+    def _copy_project(self) -> Path:
+        tmp = Path(mkdtemp()).resolve()
+        self.addCleanup(shutil.rmtree, tmp)
+        return Path(shutil.copytree(str(PROJECT), str(tmp / "project")))
+
+    def test_reload(self):
+        tmp = self._copy_project()
+        path = tmp / "templates" / "sibling.yaml"
+        original = path.read_text()
+        template = Template(path, tmp)
+        child = template.children[0]
+        path.write_text((tmp / "templates" / "nested.yaml").read_text())
+        template.reload()
+        self.assertEqual(2, len(template.children))
+        # unchanged children are re-used
+        self.assertIn(child, template.children)
+        path.write_text(original)
+        template.reload()
+        self.assertEqual([child], template.children)
+
+    def test_registry(self):
+        registry = TemplateRegistry()
+        nested = registry.get(PROJECT / "templates/nested.yaml", PROJECT, "", "p/")
+        sibling = registry.get(PROJECT / "templates/sibling.yaml", PROJECT, "", "p/")
+        self.assertIs(
+            nested,
+            registry.get(str(PROJECT / "templates/nested.yaml"), PROJECT, "", "p/"),
+        )
+        child = sibling.children[0]
+        self.assertIn(child, nested.children)
+        parent = nested.child_template("Parent")
+        self.assertIs(child, parent.children[0])
+        self.assertEqual(4, len(registry))
+        self.assertIs(nested.registry, registry)
+        # a different s3 key prefix is a different template
+        self.assertIsNot(
+            nested, registry.get(PROJECT / "templates/nested.yaml", PROJECT, "", "")
+        )
+
+    def test_registry_drops_failed_templates(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        path = tmp / "invalid.yaml"
+        path.write_text("Outputs: {}")
+        registry = TemplateRegistry()
+        with self.assertRaises(TaskCatException):
+            registry.get(path, tmp)
+        self.assertEqual(0, len(registry))
+        path.write_text("Resources: {}")
+        self.assertEqual([], registry.get(path, tmp).children)
+
+    def test_graph(self):
+        tmp = self._copy_project()
+        registry = TemplateRegistry()
+        nested = registry.get(tmp / "templates" / "nested.yaml", tmp)
+        sibling = registry.get(tmp / "templates" / "sibling.yaml", tmp)
+        parent = nested.child_template("Parent")
+        child = sibling.children[0]
+        graph = registry.graph
+        self.assertIs(graph, registry.graph)
+        self.assertEqual({child, parent}, set(nested.descendents))
+        self.assertEqual([child], sibling.descendents)
+        self.assertEqual({nested, sibling, parent}, set(child.ancestors))
+        self.assertEqual([nested], parent.ancestors)
+        order = graph.topological_order()
+        self.assertLess(order.index(nested), order.index(parent))
+        self.assertLess(order.index(parent), order.index(child))
+        tests = {"nested": nested, "sibling": sibling}
+        path = tmp / "templates" / "parent.yaml"
+        self.assertEqual(["nested"], graph.affected_tests(path, tests))
+        path = tmp / "templates" / "child.yaml"
+        self.assertEqual(["nested", "sibling"], graph.affected_tests(path, tests))
+        # writing a template changes the graph
+        parent.raw_template = "Resources: {}"
+        parent.write()
+        self.assertIsNot(graph, registry.graph)
+        self.assertEqual([], parent.descendents)
+        self.assertEqual({nested, sibling}, set(child.ancestors))
+
+    def test_graph_cycle(self):
+        tmp = self._copy_project()
+        parent = (tmp / "templates" / "parent.yaml").read_text()
+        child = parent.replace("child.yaml", "parent.yaml")
+        (tmp / "templates" / "child.yaml").write_text(child)
+        template = Template(tmp / "templates" / "parent.yaml", tmp)
+        self.assertEqual([template.children[0]], template.descendents)
+        with self.assertRaises(TaskCatException):
+            template.registry.graph.topological_order()
+
+    def test_prefetch_templates(self):
+        cache = TemplateCache()
+        levels = []
+        prefetch = cache.prefetch
+
+        def record(paths):
+            paths = list(paths)
+            levels.append({Path(p).name for p in paths})
+            return prefetch(paths)
+
+        path = PROJECT / "templates" / "nested.yaml"
+        with mock.patch.object(cache, "prefetch", side_effect=record):
+            prefetch_templates([path], PROJECT, cache)
+        # child.yaml is included by both nested.yaml and parent.yaml
+        self.assertEqual([{"nested.yaml"}, {"child.yaml", "parent.yaml"}], levels)
+        misses = cache.misses
+        Template(path, PROJECT, registry=TemplateRegistry(cache))
+        self.assertEqual(misses, cache.misses)
+
+    def test_lazy(self):
+        tmp = self._copy_project()
+        path = tmp / "templates" / "nested.yaml"
+        cache = mock.Mock(wraps=TemplateCache())
+        registry = TemplateRegistry(cache)
+        template = Template(path, tmp, "", "p/", registry, lazy=True)
+        self.assertEqual("p/templates/nested.yaml", template.s3_key)
+        cache.load.assert_not_called()
+        self.assertEqual({"Child", "Parent"}, set(template.template["Resources"]))
+        self.assertEqual(1, len(template.registry))
+        self.assertEqual(2, len(template.descendents))
+        children = template.children
+        self.assertTrue(all(child.lazy for child in children))
+        self.assertEqual(3, len(template.registry))
+        self.assertEqual(3, len(template.registry.graph.topological_order()))
+        # lazy templates sharing a registry aren't loaded to build its graph
+        lazy = Template(path, tmp, lazy=True)
+        eager = Template(tmp / "templates" / "parent.yaml", tmp, registry=lazy.registry)
+        self.assertEqual(eager.children, eager.descendents)
+        self.assertFalse(lazy.children_loaded)
+        self.assertEqual(2, len(lazy.descendents))
+        self.assertEqual({lazy, eager}, set(eager.children[0].ancestors))
+        # errors are raised when the template is used
+        (tmp / "templates" / "invalid.yaml").write_text("Outputs: {}")
+        invalid = Template(tmp / "templates" / "invalid.yaml", tmp, lazy=True)
+        for _ in range(2):
+            with self.assertRaises(TaskCatException):
+                invalid.children  # pylint: disable=pointless-statement
@@ -0,0 +1,115 @@
+import pickle
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import mkdtemp
+
+import mock
+from taskcat._cfn._template_cache import TemplateCache, _parse
+
+TEMPLATE = """
+AWSTemplateFormatVersion: 2010-09-09
+Resources:
+  Topic:
+    Type: AWS::SNS::Topic
+    Properties:
+      TopicName: !Sub "${AWS::StackName}-topic"
+      Tags:
+        - Key: name
+          Value: !Join ["", [a, !Ref AWS::Region]]
+"""
+
+
+class _Exploit:
+    def __reduce__(self):
+        return (print, ("pwned",))
+
+
+class TestTemplateCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = self.tmp / "template.yaml"
+        self.path.write_text(TEMPLATE)
+
+    def test_memory(self):
+        cache = TemplateCache()
+        raw, first = cache.load(self.path)
+        self.assertEqual(TEMPLATE, raw)
+        with mock.patch("cfnlint.decode.cfn_yaml.loads") as m_loads:
+            _, second = cache.load(self.path)
+        m_loads.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        # callers get their own copy
+        second["Resources"]["Topic"]["Type"] = "changed"
+        _, third = cache.load(self.path)
+        self.assertEqual("AWS::SNS::Topic", third["Resources"]["Topic"]["Type"])
+        self.assertEqual(3, third["Resources"].start_mark.line)
+        key = list(third["Resources"].keys())[0]
+        self.assertEqual((3, 2), (key.start_mark.line, key.start_mark.column))
+
+        self.path.write_text(TEMPLATE.replace("topic", "other"))
+        _, changed = cache.load(self.path)
+        self.assertEqual(2, cache.misses)
+        self.assertIn(
+            "other", changed["Resources"]["Topic"]["Properties"]["TopicName"]["Fn::Sub"]
+        )
+
+    def test_disk(self):
+        cache_dir = self.tmp / TemplateCache.CACHE_PATH
+        _, parsed = TemplateCache(cache_dir).load(self.path)
+        self.assertEqual(1, len(list(cache_dir.glob("*.pickle"))))
+        cache = TemplateCache(cache_dir)
+        with mock.patch("cfnlint.decode.cfn_yaml.loads") as m_loads:
+            _, loaded = cache.load(self.path)
+        m_loads.assert_not_called()
+        self.assertEqual(parsed, loaded)
+        tags = loaded["Resources"]["Topic"]["Properties"]["Tags"]
+        self.assertEqual(type(parsed["Resources"]), type(loaded["Resources"]))
+        self.assertEqual(8, tags.start_mark.line)
+        parsed_tags = parsed["Resources"]["Topic"]["Properties"]["Tags"]
+        self.assertEqual(parsed_tags.start_mark.name, tags.start_mark.name)
+        # newer cfn-lint versions decode !Sub into its own node class
+        name = parsed["Resources"]["Topic"]["Properties"]["TopicName"]
+        for template in [loaded, cache.load(self.path)[1]]:
+            topic_name = template["Resources"]["Topic"]["Properties"]["TopicName"]
+            self.assertIs(type(name), type(topic_name))
+
+    def test_disk_rejects_unexpected_objects(self):
+        cache_dir = self.tmp / TemplateCache.CACHE_PATH
+        TemplateCache(cache_dir).load(self.path)
+        cache_file = list(cache_dir.glob("*.pickle"))[0]
+        cache_file.write_bytes(pickle.dumps(_Exploit()))
+        with mock.patch("builtins.print") as m_print:
+            _, template = TemplateCache(cache_dir).load(self.path)
+        m_print.assert_not_called()
+        self.assertIn("Topic", template["Resources"])
+
+    @mock.patch("taskcat._cfn._template_cache.PARALLEL_DECODE_MIN_BYTES", 0)
+    def test_prefetch(self):
+        paths = [self.path]
+        for name in ["other.yaml", "third.yaml"]:
+            paths.append(self.tmp / name)
+            paths[-1].write_text(TEMPLATE.replace("topic", name))
+        (self.tmp / "invalid.yaml").write_text("Resources: [")
+        for cpus in [2, 1]:
+            cache = TemplateCache()
+            # workers are forked, so only the parent's own calls are counted
+            with mock.patch("os.cpu_count", return_value=cpus), mock.patch(
+                "taskcat._cfn._template_cache._parse", wraps=_parse
+            ) as m_parse:
+                decoded = cache.prefetch(paths + [self.tmp / "invalid.yaml"])
+            parsed = {str(c[0][1]) for c in m_parse.call_args_list}
+            if cpus > 1:
+                # only the invalid template is retried serially
+                self.assertEqual({str(self.tmp / "invalid.yaml")}, parsed)
+            else:
+                self.assertEqual(4, m_parse.call_count)
+            self.assertEqual({str(p) for p in paths}, set(decoded))
+            self.assertEqual(3, decoded[str(paths[1])]["Resources"].start_mark.line)
+            with mock.patch("cfnlint.decode.cfn_yaml.loads") as m_loads:
+                for path in paths:
+                    _, template = cache.load(path)
+                    self.assertEqual(decoded[str(path)], template)
+            m_loads.assert_not_called()
@@ -1,10 +1,13 @@
+import threading
+import time
 import unittest
 import uuid
+from concurrent.futures import CancelledError
 from pathlib import Path
 
 import mock
 from taskcat import Config
-from taskcat._cfn.threaded import Stacker
+from taskcat._cfn.threaded import FanOutExecutor, Stacker
 
 
 def return_mock(*args, **kwargs):
@@ -78,6 +81,57 @@ class TestStacker(unittest.TestCase):
         }
         self.assertEqual(expected, statuses)
 
+    @mock.patch("taskcat._cfn.threaded.Stack.create", return_mock)
+    def test_status_fail_fast(self):
+        test_proj = (Path(__file__).parent / "./data/nested-fail").resolve()
+        project_name, tests = get_tests(test_proj)
+        stacker = Stacker(project_name=project_name, tests=tests, fail_fast=True)
+        stacker.create_stacks()
+        for i, stack in enumerate(stacker.stacks):
+            stack.id = f"stack-id{i}"
+            stack.status_reason = ""
+            stack.status = "CREATE_IN_PROGRESS"
+        stacker.status()
+        self.assertIsNone(stacker.failed_stack)
+        failed, other = stacker.stacks
+        failed.status = "ROLLBACK_IN_PROGRESS"
+        error = mock.Mock(logical_id="Bucket", status="CREATE_FAILED")
+        failed.error_events.return_value = [error]
+        statuses = stacker.status()
+        self.assertEqual({"stack-id0": ""}, statuses["FAILED"])
+        self.assertIs(failed, stacker.failed_stack)
+        self.assertEqual([error], stacker.failed_stack_errors)
+        failed.delete.assert_not_called()
+        other.delete.assert_called_once()
+        # deletion is only triggered by the first failure
+        stacker.status()
+        other.delete.assert_called_once()
+        # the deleted stack's test is failed rather than complete
+        other.status = "DELETE_COMPLETE"
+        statuses = stacker.status()
+        self.assertEqual({}, statuses["COMPLETE"])
+        self.assertTrue(statuses["FAILED"]["stack-id1"].startswith("cancelled"))
+
+    @mock.patch("taskcat._cfn.threaded.Stack.create", return_mock)
+    def test_status_fail_fast_no_delete(self):
+        test_proj = (Path(__file__).parent / "./data/nested-fail").resolve()
+        project_name, tests = get_tests(test_proj)
+        stacker = Stacker(
+            project_name=project_name, tests=tests, fail_fast=True, no_delete=True
+        )
+        stacker.create_stacks()
+        for i, stack in enumerate(stacker.stacks):
+            stack.id = f"stack-id{i}"
+            stack.status_reason = ""
+            stack.status = "CREATE_IN_PROGRESS"
+        failed, other = stacker.stacks
+        failed.status = "ROLLBACK_IN_PROGRESS"
+        failed.error_events.return_value = []
+        stacker.status()
+        self.assertIs(failed, stacker.failed_stack)
+        self.assertTrue(stacker.stop_waiting)
+        other.delete.assert_not_called()
+
     @mock.patch("taskcat._cfn.threaded.Stack.create", return_mock)
     def test_events(self):
         test_proj = (Path(__file__).parent / "./data/nested-fail").resolve()
@@ -183,3 +237,122 @@ class TestStacker(unittest.TestCase):
             clients, uuid.UUID(int=0), "nested-fail", {"taskcat-json": mock.Mock()}
         )
         self.assertEqual(1, len(s))
+
+    def test_refresh_per_client(self):
+        client = mock.Mock()
+        stacks = [mock.Mock(id="stack-1"), mock.Mock(id="stack-2")]
+        stacks.append(mock.Mock(id="deleted-stack"))
+        stacks.append(mock.Mock(id="gone-stack", status="DELETE_COMPLETE"))
+
+        class Paging:
+            @staticmethod
+            def paginate(**kwargs):
+                return [
+                    {"Stacks": [{"StackId": "other-stack"}, {"StackId": "stack-1"}]},
+                    {"Stacks": [{"StackId": "stack-2"}]},
+                ]
+
+        client.get_paginator.return_value = Paging()
+        Stacker._refresh_per_client({"Client": client, "Stacks": stacks})
+        client.get_paginator.assert_called_once_with("describe_stacks")
+        stacks[0].set_stack_properties.assert_called_once_with(
+            stack_properties={"StackId": "stack-1"}
+        )
+        stacks[1].set_stack_properties.assert_called_once_with(
+            stack_properties={"StackId": "stack-2"}
+        )
+        stacks[2].set_stack_properties.assert_called_once_with()
+        stacks[3].set_stack_properties.assert_not_called()
+        # there's nothing to sweep for once every stack is deleted
+        client.reset_mock()
+        Stacker._refresh_per_client({"Client": client, "Stacks": stacks[3:]})
+        client.get_paginator.assert_not_called()
+
+
+class TestFanOutExecutor(unittest.TestCase):
+    def test_map_preserves_order(self):
+        executor = FanOutExecutor(max_workers=4)
+        self.assertEqual([0, 1, 4, 9, 16], executor.map(lambda x: x * x, range(5)))
+        self.assertEqual([], executor.map(lambda x: x, []))
+        executor.shutdown()
+
+    def test_map_raises_first_error(self):
+        def fail_odd(item):
+            if item % 2:
+                raise ValueError(item)
+            return item
+
+        executor = FanOutExecutor(max_workers=4)
+        with self.assertRaises(ValueError) as cm:
+            executor.map(fail_odd, range(6), threads=3)
+        self.assertEqual((1,), cm.exception.args)
+        executor.shutdown()
+
+    def test_map_stops_on_keyboard_interrupt(self):
+        calls = []
+
+        def interrupt(item):
+            calls.append(item)
+            raise KeyboardInterrupt()
+
+        executor = FanOutExecutor(max_workers=4)
+        with self.assertRaises(KeyboardInterrupt):
+            executor.map(interrupt, range(20), threads=1)
+        self.assertEqual([0], calls)
+        executor.shutdown()
+
+    def test_nested_map_does_not_deadlock(self):
+        executor = FanOutExecutor(max_workers=2)
+
+        def outer(item):
+            return sum(executor.map(lambda x: x + item, range(4), threads=4))
+
+        self.assertEqual([6, 10, 14, 18], executor.map(outer, range(4), threads=4))
+        executor.shutdown()
+
+    def test_key_limit(self):
+        executor = FanOutExecutor(
+            max_workers=8, key_limit=3, service_limits={"throttled": 1}
+        )
+        lock = threading.Lock()
+        running = {}
+        peak = {}
+
+        def work(key):
+            with lock:
+                running[key] = running.get(key, 0) + 1
+                peak[key] = max(peak.get(key, 0), running[key])
+            time.sleep(0.01)
+            with lock:
+                running[key] -= 1
+
+        payload = [("123", "us-east-1", "cloudformation")] * 12
+        payload += [("123", "us-east-1", "throttled")] * 4
+        executor.map(work, payload, threads=8, key=lambda k: k)
+        self.assertLessEqual(peak[("123", "us-east-1", "cloudformation")], 3)
+        self.assertEqual(1, peak[("123", "us-east-1", "throttled")])
+        executor.shutdown()
+
+    def test_cancel(self):
+        executor = FanOutExecutor(max_workers=2)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work(item):
+            calls.append(item)
+            started.set()
+            release.wait(5)
+
+        def cancel():
+            started.wait(5)
+            executor.cancel()
+            release.set()
+
+        canceller = threading.Thread(target=cancel)
+        canceller.start()
+        with self.assertRaises(CancelledError):
+            executor.map(work, range(10), threads=1)
+        canceller.join()
+        self.assertEqual([0], calls)
+        executor.shutdown()
@@ -0,0 +1,19 @@
+import unittest
+
+import mock
+from taskcat._cli_modules.test import Test
+from taskcat.exceptions import TaskCatException
+
+
+class TestTestCli(unittest.TestCase):
+    @mock.patch("taskcat._cli_modules.test.RATE_LIMITER")
+    @mock.patch("taskcat._cli_modules.test.FAN_OUT_EXECUTOR")
+    @mock.patch("taskcat._cli_modules.test.REFRESH_SCHEDULER")
+    @mock.patch.object(Test, "_run")
+    def test_run_shuts_down_on_error(self, m_run, m_scheduler, m_executor, m_limiter):
+        m_run.side_effect = TaskCatException("Lint failed with errors")
+        with self.assertRaises(TaskCatException):
+            Test.run()
+        m_scheduler.shutdown.assert_called_once()
+        m_executor.shutdown.assert_called_once()
+        m_limiter.log_stats.assert_called_once()
@@ -3,6 +3,7 @@ import unittest
 from pathlib import Path
 
 import mock
+from taskcat._cfn._template_cache import TEMPLATE_CACHE
 from taskcat._client_factory import Boto3Cache
 from taskcat._config import Config
 
@@ -214,9 +215,31 @@ class TestNewConfig(unittest.TestCase):
             env_vars={},
         )
         templates = config.get_templates(base_path)
+        # templates are loaded once per config
+        again = config.get_templates(base_path)
         for test_name, _template in templates.items():
             with self.subTest(test=test_name):
-                pass
+                self.assertIs(_template, again[test_name])
+                self.assertIs(config.template_registry, _template.registry)
+
+    @mock.patch("taskcat._cfn._template_cache.TemplateCache._write")
+    def test_get_templates_cache_dir(self, _):
+        base_path = "./" if os.getcwd().endswith("/tests") else "./tests/"
+        base_path = Path(base_path + "data/regional_client_and_bucket").resolve()
+        config = Config.create(
+            args={"project": {"template_cache": True}},
+            global_config_path=base_path / ".taskcat_global.yml",
+            project_config_path=base_path / "./.taskcat.yml",
+            overrides_path=base_path / "./.taskcat_overrides.yml",
+            env_vars={},
+        )
+        config.get_templates(base_path)
+        # the cache directory is set on the config's registry, not process wide
+        self.assertEqual(
+            base_path / ".taskcat/template_cache",
+            config.template_registry.cache.cache_dir,
+        )
+        self.assertIsNone(TEMPLATE_CACHE.cache_dir)
 
 
 def mock_client(*args, **kwargs):
@@ -0,0 +1,67 @@
+import unittest
+import uuid
+
+import mock
+from taskcat._dataclasses import S3BucketObj
+from taskcat.exceptions import TaskCatException
+
+
+def make_bucket(s3_client, auto_generated=True):
+    return S3BucketObj(
+        name="bucket",
+        region="us-east-1",
+        account_id="123412341234",
+        partition="aws",
+        s3_client=s3_client,
+        sigv4=True,
+        auto_generated=auto_generated,
+        object_acl="private",
+        taskcat_id=uuid.UUID(int=0),
+    )
+
+
+def version_pages(count, page_size=1000):
+    pages = []
+    for start in range(0, count, page_size):
+        keys = range(start, min(start + page_size, count))
+        pages.append(
+            {
+                "Versions": [{"Key": f"v{i}", "VersionId": str(i)} for i in keys],
+                "DeleteMarkers": [{"Key": f"m{start}", "VersionId": "marker"}],
+            }
+        )
+    return pages
+
+
+class TestS3BucketObj(unittest.TestCase):
+    def test_empty(self):
+        s3_client = mock.Mock()
+        paginator = s3_client.get_paginator.return_value
+        paginator.paginate.return_value = version_pages(2500, page_size=999)
+        s3_client.delete_objects.return_value = {}
+        make_bucket(s3_client).empty()
+        s3_client.get_paginator.assert_called_once_with("list_object_versions")
+        self.assertEqual(3, s3_client.delete_objects.call_count)
+        deleted = [
+            obj
+            for call in s3_client.delete_objects.call_args_list
+            for obj in call[1]["Delete"]["Objects"]
+        ]
+        self.assertEqual(2503, len(deleted))
+        self.assertIn({"Key": "m0", "VersionId": "marker"}, deleted)
+        self.assertIn({"Key": "v2499", "VersionId": "2499"}, deleted)
+
+    def test_empty_errors(self):
+        s3_client = mock.Mock()
+        paginator = s3_client.get_paginator.return_value
+        paginator.paginate.return_value = version_pages(10)
+        s3_client.delete_objects.return_value = {
+            "Errors": [{"Key": "v1", "Code": "AccessDenied"}]
+        }
+        with self.assertRaises(TaskCatException):
+            make_bucket(s3_client).empty()
+
+    def test_empty_not_auto_generated(self):
+        s3_client = mock.Mock()
+        make_bucket(s3_client, auto_generated=False).empty()
+        s3_client.delete_objects.assert_not_called()
@@ -0,0 +1,65 @@
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import mkdtemp
+
+from taskcat._ignore import ExclusionRules
+
+
+class TestExclusionRules(unittest.TestCase):
+    def test_patterns(self):
+        rules = ExclusionRules(
+            [
+                "# comment",
+                "",
+                "*.md",
+                "!README.md",
+                "/build/",
+                "docs/**/*.png",
+                "**/cache",
+                "tmp?",
+                "[!a]bc",
+            ]
+        )
+        cases = [
+            ("notes.md", False, True),
+            ("docs/notes.md", False, True),
+            ("README.md", False, False),
+            ("build", True, True),
+            ("build", False, False),
+            ("src/build", True, False),
+            ("docs/img.png", False, True),
+            ("docs/a/b/img.png", False, True),
+            ("img.png", False, False),
+            ("cache", True, True),
+            ("a/b/cache", False, True),
+            ("tmp1", False, True),
+            ("tmp12", False, False),
+            ("xbc", False, True),
+            ("abc", False, False),
+            ("templates/test.yaml", False, False),
+        ]
+        for path, is_dir, expected in cases:
+            self.assertEqual(expected, rules.excluded(path, is_dir), path)
+
+    def test_trailing_double_star(self):
+        rules = ExclusionRules(["logs/**", "!logs/keep"])
+        self.assertTrue(rules.excluded("logs/a/b.txt"))
+        self.assertFalse(rules.excluded("logs/keep"))
+        self.assertFalse(rules.excluded("other/logs/a.txt"))
+
+    def test_from_project(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        (tmp / ".taskcatignore").write_text("tests/\n!important.md\n")
+        rules = ExclusionRules.from_project(tmp, ["*.md"])
+        self.assertTrue(rules.excluded("tests", is_dir=True))
+        self.assertTrue(rules.excluded("other.md"))
+        self.assertFalse(rules.excluded("important.md"))
+        self.assertFalse(ExclusionRules.from_project(tmp / "missing").excluded("a"))
+
+    def test_matches(self):
+        rules = ExclusionRules(["/templates/", "!/templates/unused.yaml"])
+        self.assertTrue(rules.matches("templates", is_dir=True))
+        self.assertFalse(rules.matches("templates/unused.yaml"))
+        self.assertFalse(rules.matches("scripts/boot.sh"))
@@ -0,0 +1,99 @@
+import unittest
+
+import mock
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
+from botocore.hooks import HierarchicalEmitter
+from taskcat._rate_limit import AdaptiveRateLimiter, TokenBucket, is_throttling_error
+
+
+class TestTokenBucket(unittest.TestCase):
+    @mock.patch("taskcat._rate_limit.sleep")
+    @mock.patch("taskcat._rate_limit.monotonic", return_value=100.0)
+    def test_acquire_delays_when_empty(self, _, m_sleep):
+        bucket = TokenBucket(rate=2.0)
+        self.assertEqual(0.0, bucket.acquire())
+        self.assertEqual(0.0, bucket.acquire())
+        self.assertEqual(0.5, bucket.acquire())
+        self.assertEqual(1.0, bucket.acquire())
+        m_sleep.assert_has_calls([mock.call(0.5), mock.call(1.0)])
+        self.assertEqual(4, bucket.calls)
+        self.assertEqual(2, bucket.delayed)
+
+    @mock.patch("taskcat._rate_limit.monotonic", return_value=100.0)
+    def test_throttle_and_recover(self, _):
+        bucket = TokenBucket(rate=8.0, max_rate=8.0, min_rate=1.0, increase=1.0)
+        for _ in range(5):
+            bucket.throttle()
+        self.assertEqual(1.0, bucket.rate)
+        self.assertEqual(5, bucket.throttled)
+        for _ in range(3):
+            bucket.success()
+        self.assertEqual(4.0, bucket.rate)
+        for _ in range(10):
+            bucket.success()
+        self.assertEqual(8.0, bucket.rate)
+
+    @mock.patch("taskcat._rate_limit.sleep")
+    @mock.patch("taskcat._rate_limit.monotonic")
+    def test_unpaced_until_throttled(self, m_monotonic, m_sleep):
+        m_monotonic.return_value = 100.0
+        bucket = TokenBucket()
+        for i in range(200):
+            m_monotonic.return_value = 100.0 + i * 0.01
+            self.assertEqual(0.0, bucket.acquire())
+        m_sleep.assert_not_called()
+        self.assertIsNone(bucket.rate)
+        bucket.success()
+        self.assertIsNone(bucket.rate)
+        # 101 calls in the last second
+        bucket.throttle()
+        self.assertEqual(50.5, bucket.rate)
+        self.assertEqual(101.0, bucket.max_rate)
+        self.assertGreater(bucket.acquire(), 0.0)
+        # pacing stops once calls haven't been throttled for a while
+        m_monotonic.return_value += TokenBucket.QUIET_PERIOD - 1
+        bucket.success()
+        self.assertEqual(51.0, bucket.rate)
+        m_monotonic.return_value += 1
+        bucket.success()
+        self.assertIsNone(bucket.rate)
+        self.assertIsNone(bucket.max_rate)
+        self.assertEqual(0.0, bucket.acquire())
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_install(self):
+        limiter = AdaptiveRateLimiter()
+        client = mock.Mock()
+        client.meta.events = HierarchicalEmitter()
+        limiter.install(client, "default", "us-east-1")
+        event = "DescribeStacks"
+        key = ("default", "us-east-1", "cloudformation", event)
+        client.meta.events.emit(f"before-send.cloudformation.{event}", request=None)
+        throttled = (None, {"Error": {"Code": "Throttling"}})
+        client.meta.events.emit(
+            f"needs-retry.cloudformation.{event}", response=throttled, attempts=1
+        )
+        self.assertEqual(1, limiter.bucket(key).calls)
+        self.assertEqual(1, limiter.bucket(key).throttled)
+        # paced at half the single call made before being throttled
+        self.assertEqual(0.5, limiter.bucket(key).rate)
+        client.meta.events.emit(
+            f"needs-retry.cloudformation.{event}", response=(None, {}), attempts=2
+        )
+        self.assertEqual(1.0, limiter.bucket(key).rate)
+        stats = limiter.stats()
+        self.assertEqual(1, stats["calls"])
+        self.assertEqual(1, stats["throttled"])
+
+    def test_is_throttling_error(self):
+        slow_down = ClientError({"Error": {"Code": "SlowDown"}}, "PutObject")
+        denied = ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")
+        self.assertTrue(is_throttling_error(slow_down))
+        self.assertFalse(is_throttling_error(denied))
+        quota = ClientError({"Error": {"Code": "LimitExceededException"}}, "Create")
+        self.assertFalse(is_throttling_error(quota))
+        self.assertTrue(is_throttling_error(S3UploadFailedError(str(slow_down))))
+        self.assertFalse(is_throttling_error(S3UploadFailedError(str(denied))))
+        self.assertFalse(is_throttling_error(ValueError("SlowDown")))
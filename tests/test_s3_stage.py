@@ -0,0 +1,96 @@
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import mkdtemp
+
+import mock
+from taskcat._cfn.template import Template
+from taskcat._s3_stage import reachable_files, stage_in_s3
+from taskcat._s3_sync import S3Sync
+
+PROJECT = (Path(__file__).parent / "./data/nested-stacks").resolve()
+
+
+def make_bucket(name, partition):
+    bucket = mock.Mock(partition=partition, object_acl="private")
+    bucket.name = name
+    return bucket
+
+
+class TestStageInS3(unittest.TestCase):
+    @mock.patch("taskcat._s3_stage.S3Sync")
+    def test_stage_in_s3(self, m_sync):
+        m_sync.get_local_file_list.return_value = {"file": ["/file", '"etag"']}
+        buckets = {
+            "test1": {
+                "us-east-1": make_bucket("bucket-1", "aws"),
+                "us-west-2": make_bucket("bucket-2", "aws"),
+                "cn-north-1": make_bucket("bucket-cn", "aws-cn"),
+            },
+            "test2": {"us-east-1": make_bucket("bucket-1", "aws")},
+        }
+        stage_in_s3(buckets, "project", "/project")
+        m_sync.get_local_file_list.assert_called_once_with("/project", None)
+        sources = {c[0][1]: c[1]["source_bucket"] for c in m_sync.call_args_list}
+        self.assertEqual(
+            {"bucket-1": None, "bucket-2": "bucket-1", "bucket-cn": None}, sources
+        )
+        for call in m_sync.call_args_list:
+            self.assertEqual({"file": ["/file", '"etag"']}, call[1]["file_list"])
+            self.assertIsNone(call[1]["transfer_config"])
+
+
+class TestReachableFiles(unittest.TestCase):
+    def setUp(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        self.project = Path(shutil.copytree(str(PROJECT), str(tmp / "project")))
+        for path in [
+            "docs/guide.txt",
+            "extra/keep.txt",
+            "extra/sub/a.txt",
+            "lambda_functions/packages/fn/lambda.zip",
+            "submodules/sub/lambda_functions/packages/fn/lambda.zip",
+            "submodules/sub/docs/guide.txt",
+        ]:
+            (self.project / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.project / path).write_text("")
+
+    def test_reachable_files(self):
+        tmp = self.project
+        templates = {"test": Template(tmp / "templates/parent.yaml", tmp)}
+        include = reachable_files(
+            tmp, templates, "lambda_functions/packages", ["/extra/"]
+        )
+        file_list = S3Sync.get_local_file_list(str(tmp), include)
+        self.assertEqual(
+            [
+                "extra/keep.txt",
+                "extra/sub/a.txt",
+                "lambda_functions/packages/fn/lambda.zip",
+                "scripts/boot.sh",
+                "submodules/sub/lambda_functions/packages/fn/lambda.zip",
+                "templates/child.yaml",
+                "templates/parent.yaml",
+            ],
+            sorted(file_list),
+        )
+
+    def test_include_directories(self):
+        tmp = self.project
+        templates = {"test": Template(tmp / "templates/standalone.yaml", tmp)}
+        # with or without the trailing or leading slash, a directory pattern
+        # includes everything in the directory
+        for pattern in ["extra", "extra/", "/extra", "/extra/", "**/extra"]:
+            include = reachable_files(tmp, templates, include=[pattern])
+            file_list = S3Sync.get_local_file_list(str(tmp), include)
+            self.assertEqual(
+                ["extra/keep.txt", "extra/sub/a.txt", "templates/standalone.yaml"],
+                sorted(file_list),
+                pattern,
+            )
+        include = reachable_files(tmp, templates, include=["extra", "!extra/sub"])
+        file_list = S3Sync.get_local_file_list(str(tmp), include)
+        self.assertEqual(
+            ["extra/keep.txt", "templates/standalone.yaml"], sorted(file_list)
+        )
@@ -1,19 +1,37 @@
+import hashlib
+import io
+import json
 import os
+import shutil
 import unittest
 from pathlib import Path
+from tempfile import mkdtemp
 
 import mock
-from taskcat._s3_sync import S3Sync
+from botocore.exceptions import ClientError
+from taskcat._s3_sync import PART_SIZE, HashCache, S3Sync, build_transfer_config
+from taskcat.exceptions import TaskCatException
+
+
+def make_future(error=None):
+    future = mock.Mock()
+    if error:
+        future.result.side_effect = error
+    return future
 
 
 class TestS3Sync(unittest.TestCase):
-    def test_init(self):
+    @mock.patch("taskcat._s3_sync.TransferManager")
+    @mock.patch("taskcat._s3_sync.HashCache.save")
+    def test_init(self, _, m_manager):
         m_s3_client = mock.Mock()
         m_s3_client.list_objects_v2.return_value = {
             "Contents": [{"Key": "test_prefix/test_object", "ETag": "test_etag"}]
         }
         m_s3_client.delete_objects.return_value = {}
-        m_s3_client.upload_file.return_value = None
+        m_s3_client.get_object.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchKey"}}, "GetObject"
+        )
         prefix = "test_prefix"
         base_path = "./" if os.getcwd().endswith("/tests") else "./tests/"
         base_path = Path(base_path + "data/").resolve()
@@ -25,4 +43,292 @@ class TestS3Sync(unittest.TestCase):
         )
         m_s3_client.list_objects_v2.assert_called_once()
         m_s3_client.delete_objects.assert_called_once()
-        m_s3_client.upload_file.assert_called()
+        m_manager.assert_called_with(m_s3_client, mock.ANY)
+        m_manager.return_value.__enter__.return_value.upload.assert_called()
+        m_s3_client.put_object.assert_called_once()
+
+    @mock.patch("taskcat._s3_sync.TransferManager")
+    def test_manifest(self, m_manager):
+        manager = m_manager.return_value.__enter__.return_value
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        (tmp / "test.yaml").write_text("Resources: {}")
+        (tmp / "new.yaml").write_text("Resources: {New: {}}")
+        etag = S3Sync._hash_file(tmp / "test.yaml")
+        new_etag = S3Sync._hash_file(tmp / "new.yaml")
+        manifest = {
+            "Version": S3Sync.MANIFEST_VERSION,
+            "Prefix": "prefix/",
+            "Objects": {"test.yaml": etag, "new.yaml": '"old"'},
+        }
+        remote = dict(manifest["Objects"])
+        m_s3_client = mock.Mock()
+        m_s3_client.get_object.return_value = {
+            "Body": io.BytesIO(json.dumps(manifest).encode("utf-8"))
+        }
+        m_s3_client.head_object.side_effect = lambda Bucket, Key: {
+            "ETag": remote[Key[len("prefix/") :]]
+        }
+        S3Sync(m_s3_client, "bucket", "prefix", str(tmp))
+        self.assertEqual(2, m_s3_client.head_object.call_count)
+        m_s3_client.list_objects_v2.assert_not_called()
+        manager.upload.assert_called_once_with(
+            str(tmp / "new.yaml"),
+            "bucket",
+            "prefix/new.yaml",
+            extra_args={"ACL": "private"},
+            subscribers=mock.ANY,
+        )
+        m_s3_client.delete_object.assert_called_once_with(
+            Bucket="bucket", Key="prefix/" + S3Sync.MANIFEST_NAME
+        )
+        written = json.loads(m_s3_client.put_object.call_args[1]["Body"])
+        self.assertEqual({"test.yaml": etag, "new.yaml": new_etag}, written["Objects"])
+
+        # nothing to do, the manifest is left as is
+        remote["new.yaml"] = new_etag
+        m_s3_client.reset_mock()
+        manager.reset_mock()
+        m_s3_client.get_object.return_value = {
+            "Body": io.BytesIO(json.dumps(written).encode("utf-8"))
+        }
+        S3Sync(m_s3_client, "bucket", "prefix", str(tmp))
+        manager.upload.assert_not_called()
+        m_s3_client.put_object.assert_not_called()
+        m_s3_client.delete_object.assert_not_called()
+
+        # a manifest for a different prefix is ignored
+        m_s3_client.reset_mock()
+        written["Prefix"] = "other/"
+        m_s3_client.get_object.return_value = {
+            "Body": io.BytesIO(json.dumps(written).encode("utf-8"))
+        }
+        m_s3_client.list_objects_v2.return_value = {}
+        S3Sync(m_s3_client, "bucket", "prefix", str(tmp))
+        m_s3_client.list_objects_v2.assert_called_once()
+
+        # an object deleted outside of taskcat falls back to listing the prefix
+        m_s3_client.reset_mock()
+        manager.reset_mock()
+        written["Prefix"] = "prefix/"
+        m_s3_client.get_object.return_value = {
+            "Body": io.BytesIO(json.dumps(written).encode("utf-8"))
+        }
+        m_s3_client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "404"}}, "HeadObject"
+        )
+        m_s3_client.list_objects_v2.return_value = {
+            "Contents": [{"Key": "prefix/test.yaml", "ETag": etag}]
+        }
+        S3Sync(m_s3_client, "bucket", "prefix", str(tmp))
+        m_s3_client.list_objects_v2.assert_called_once()
+        manager.upload.assert_called_once_with(
+            str(tmp / "new.yaml"),
+            "bucket",
+            "prefix/new.yaml",
+            extra_args={"ACL": "private"},
+            subscribers=mock.ANY,
+        )
+
+    def test_hash_cache(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        (tmp / "templates").mkdir()
+        template = tmp / "templates" / "test.yaml"
+        template.write_text("Resources: {}")
+        old = 1_000_000_000
+        os.utime(template, (old, old))
+        sync = S3Sync.__new__(S3Sync)
+        expected = S3Sync._hash_file(str(template))
+
+        files = sync._get_local_file_list(str(tmp))
+        self.assertEqual(expected, files["templates/test.yaml"][1])
+        self.assertTrue((tmp / HashCache.CACHE_PATH).is_file())
+
+        with mock.patch.object(S3Sync, "_hash_file") as m_hash:
+            files = sync._get_local_file_list(str(tmp))
+            m_hash.assert_not_called()
+        self.assertEqual(expected, files["templates/test.yaml"][1])
+
+        template.write_text("Resources: {Changed: true}")
+        os.utime(template, (old + 1, old + 1))
+        files = sync._get_local_file_list(str(tmp))
+        self.assertEqual(
+            S3Sync._hash_file(str(template)), files["templates/test.yaml"][1]
+        )
+        self.assertNotEqual(expected, files["templates/test.yaml"][1])
+
+    def test_hash_cache_skips_recent_files(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        (tmp / "test.yaml").write_text("Resources: {}")
+        cache = HashCache(tmp)
+        stat = os.stat(tmp / "test.yaml")
+        cache.set("test.yaml", stat, '"etag"')
+        self.assertIsNone(cache.get("test.yaml", stat))
+
+    def test_hash_file(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        data = os.urandom(2500)
+        (tmp / "multipart").write_bytes(data)
+        (tmp / "single").write_bytes(data[:1000])
+        (tmp / "empty").write_bytes(b"")
+        parts = [hashlib.md5(data[i : i + 1024]).digest() for i in (0, 1024, 2048)]
+        multipart = '"{}-3"'.format(hashlib.md5(b"".join(parts)).hexdigest())
+        single = '"{}"'.format(hashlib.md5(data[:1000]).hexdigest())
+        empty = '"{}"'.format(hashlib.md5(b"").hexdigest())
+        self.assertEqual(multipart, S3Sync._hash_file(tmp / "multipart", 1024))
+        self.assertEqual(single, S3Sync._hash_file(tmp / "single", 1024))
+        self.assertEqual(empty, S3Sync._hash_file(tmp / "empty", 1024))
+
+        paths = [tmp / "multipart", tmp / "empty", tmp / "single"]
+        with mock.patch("taskcat._s3_sync.PARALLEL_HASH_MIN_BYTES", 0), mock.patch(
+            "taskcat._s3_sync.os.cpu_count", return_value=2
+        ):
+            checksums = S3Sync._hash_files(paths, 1024)
+        self.assertEqual([multipart, empty, single], checksums)
+
+    @staticmethod
+    def _make_sync(m_manager):
+        sync = S3Sync.__new__(S3Sync)
+        sync.s3_client = mock.Mock()
+        sync.transfer_config = build_transfer_config()
+        return sync, m_manager.return_value.__enter__.return_value
+
+    @mock.patch("taskcat._s3_sync.TransferManager")
+    def test_transfer_largest_first(self, m_manager):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        (tmp / "small").write_bytes(b"1")
+        (tmp / "large").write_bytes(b"123")
+        sync, manager = self._make_sync(m_manager)
+        manager.upload.return_value = make_future()
+        items = [[str(tmp / name), "dest", name] for name in ["small", "large"]]
+        sync._transfer(items, "prefix/", "private")
+        self.assertEqual(
+            ["prefix/large", "prefix/small"],
+            [c[0][2] for c in manager.upload.call_args_list],
+        )
+
+    @mock.patch("taskcat._s3_sync.TransferManager")
+    def test_copy_falls_back_to_upload(self, m_manager):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        (tmp / "file").write_text("data")
+        sync, manager = self._make_sync(m_manager)
+        manager.copy.return_value = make_future(
+            ClientError({"Error": {"Code": "AccessDenied"}}, "CopyObject")
+        )
+        manager.upload.return_value = make_future()
+        items = [[str(tmp / "file"), "dest", "file"]]
+        sources = {"file": {"Bucket": "source", "Key": "prefix/file"}}
+        sync._transfer(items, "prefix/", "private", sources)
+        manager.copy.assert_called_once_with(
+            {"Bucket": "source", "Key": "prefix/file"},
+            "dest",
+            "prefix/file",
+            extra_args={"ACL": "private"},
+            subscribers=mock.ANY,
+        )
+        manager.upload.assert_called_once_with(
+            str(tmp / "file"),
+            "dest",
+            "prefix/file",
+            extra_args={"ACL": "private"},
+            subscribers=mock.ANY,
+        )
+
+    @mock.patch("taskcat._s3_sync.TransferManager")
+    def test_duplicates_are_copied(self, m_manager):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        for name in ["a/vpc.yaml", "b/vpc.yaml", "kept.yaml", "c/kept.yaml"]:
+            (tmp / name).parent.mkdir(exist_ok=True)
+            (tmp / name).write_text("kept" if "kept" in name else "vpc")
+        (tmp / "c" / "vpc.yaml").write_text("vpc")
+        local_list = S3Sync._get_local_file_list(str(tmp))
+        s3_list = {"kept.yaml": local_list["kept.yaml"][1]}
+        sync, manager = self._make_sync(m_manager)
+        manager.upload.return_value = make_future()
+        manager.copy.return_value = make_future()
+        sync._sync(local_list, s3_list, "bucket", "prefix/", "private")
+
+        manager.upload.assert_called_once()
+        uploaded = manager.upload.call_args[0][2]
+        self.assertIn(uploaded, {f"prefix/{d}/vpc.yaml" for d in "abc"})
+        copies = {c[0][2]: c[0][0]["Key"] for c in manager.copy.call_args_list}
+        expected = {f"prefix/{d}/vpc.yaml": uploaded for d in "abc"}
+        del expected[uploaded]
+        expected["prefix/c/kept.yaml"] = "prefix/kept.yaml"
+        self.assertEqual(expected, copies)
+        # copies of the uploaded file only start once the upload has completed
+        self.assertEqual(2, m_manager.call_count)
+
+    @mock.patch("taskcat._s3_sync.time.sleep")
+    @mock.patch("taskcat._s3_sync.TransferManager")
+    def test_transfer_retries(self, m_manager, m_sleep):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        (tmp / "file").write_text("data")
+        sync, manager = self._make_sync(m_manager)
+        items = [[str(tmp / "file"), "dest", "file"]]
+        slow_down = ClientError({"Error": {"Code": "SlowDown"}}, "PutObject")
+        manager.upload.side_effect = [
+            make_future(slow_down),
+            make_future(ValueError("connection reset")),
+            make_future(),
+        ]
+        sync._transfer(items, "prefix/", "private")
+        self.assertEqual(3, manager.upload.call_count)
+        # throttled retries don't back off, the rate limiter already has
+        m_sleep.assert_called_once_with(4)
+
+        manager.upload.side_effect = None
+        manager.upload.return_value = make_future(
+            ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")
+        )
+        manager.upload.reset_mock()
+        with self.assertRaises(TaskCatException):
+            sync._transfer(items, "prefix/", "private")
+        manager.upload.assert_called_once()
+
+    def test_transfer_config_matches_etag_parts(self):
+        config = build_transfer_config(max_concurrency=4, max_bandwidth=1024)
+        self.assertEqual(PART_SIZE, config.multipart_chunksize)
+        # a file of exactly PART_SIZE is hashed as a single part
+        self.assertEqual(PART_SIZE + 1, config.multipart_threshold)
+        self.assertEqual(4, config.max_request_concurrency)
+        self.assertEqual(1024, config.max_bandwidth)
+
+    def test_exclusions_prune_walk(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        for path in [
+            "templates/test.yaml",
+            "templates/.git/config",
+            "node_modules/pkg/index.js",
+            "functions/source/lambda/app.py",
+            "functions/packages/lambda/lambda.zip",
+            "docs/guide.md",
+            "scratch/notes.txt",
+        ]:
+            (tmp / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp / path).write_text(path)
+        (tmp / ".taskcatignore").write_text("scratch/\n")
+        walked = []
+        real_walk = os.walk
+
+        def walk(*args, **kwargs):
+            for root, dirs, files in real_walk(*args, **kwargs):
+                walked.append(root)
+                yield root, dirs, files
+
+        with mock.patch("taskcat._s3_sync.os.walk", side_effect=walk):
+            files = S3Sync._get_local_file_list(str(tmp), include_checksums=False)
+        self.assertEqual(
+            ["functions/packages/lambda/lambda.zip", "templates/test.yaml"],
+            sorted(files),
+        )
+        for excluded in ["node_modules", ".git", "source", "scratch"]:
+            self.assertFalse([w for w in walked if w.endswith(excluded)], excluded)
@@ -0,0 +1,85 @@
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import mkdtemp
+
+import mock
+from taskcat._cfn.template import Template
+from taskcat._s3_sync import S3Sync
+from taskcat._watch import ProjectWatcher
+
+PROJECT = (Path(__file__).parent / "./data/nested-stacks").resolve()
+
+
+class TestProjectWatcher(unittest.TestCase):
+    def setUp(self):
+        tmp = Path(mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp)
+        self.tmp = Path(shutil.copytree(str(PROJECT), str(tmp / "project")))
+        self.template = Template(self.tmp / "templates" / "parent.yaml", self.tmp)
+
+    def test_changes(self):
+        watcher = ProjectWatcher(self.tmp, {"test": self.template})
+        self.assertEqual(set(), watcher.changes())
+        (self.tmp / "scripts" / "boot.sh").write_text("echo changed")
+        (self.tmp / "scripts" / "new.sh").write_text("echo")
+        (self.tmp / "README.md").write_text("excluded")
+        (self.tmp / "templates" / "child.yaml").unlink()
+        self.assertEqual(
+            {"scripts/boot.sh", "scripts/new.sh", "templates/child.yaml"},
+            watcher.changes(),
+        )
+        self.assertEqual(set(), watcher.changes())
+
+    def test_affected_tests(self):
+        other = Template(self.tmp / "templates" / "child.yaml", self.tmp)
+        watcher = ProjectWatcher(self.tmp, {"parent": self.template, "child": other})
+        changed = {"templates/child.yaml", "scripts/boot.sh"}
+        self.assertEqual(["child", "parent"], watcher.affected_tests(changed))
+        self.assertEqual(["parent"], watcher.affected_tests({"templates/parent.yaml"}))
+
+    def test_update(self):
+        lint = mock.Mock()
+        stage = mock.Mock()
+        watcher = ProjectWatcher(self.tmp, {"test": self.template}, lint, stage)
+        watcher.update_file_list(set())
+        child = self.template.children[0]
+        child_path = self.tmp / "templates" / "child.yaml"
+        child_path.write_text("Resources: {Topic: {Type: AWS::SNS::Topic}}")
+
+        self.assertTrue(watcher.update())
+        self.assertIn("Topic", child.template["Resources"])
+        lint.relint.assert_called_once_with({child_path})
+        file_list = stage.call_args[0][0]
+        self.assertEqual(
+            S3Sync._hash_file(child_path), file_list["templates/child.yaml"][1]
+        )
+        self.assertFalse(watcher.update())
+
+        # removing a child re-lints the parent
+        lint.reset_mock()
+        child_path.unlink()
+        self.assertTrue(watcher.update())
+        lint.relint.assert_called_once_with({self.template.template_path})
+        self.assertEqual([], self.template.children)
+        self.assertNotIn("templates/child.yaml", stage.call_args[0][0])
+
+    @mock.patch("taskcat._watch.time.sleep")
+    def test_watch(self, m_sleep):
+        stage = mock.Mock()
+        include = mock.Mock(return_value=None)
+        watcher = ProjectWatcher(
+            self.tmp, {"test": self.template}, stage=stage, include=include
+        )
+        watcher.watch(interval=0.5, iterations=2)
+        stage.assert_called_once()
+        include.assert_called_once_with({"test": self.template})
+        # everything but README.md, which is excluded by default
+        templates = ["child", "nested", "parent", "remote", "sibling", "standalone"]
+        self.assertEqual(
+            {f"templates/{name}.yaml" for name in templates}
+            | {"scripts/boot.sh", "scripts/other.sh"},
+            set(stage.call_args[0][0]),
+        )
+        m_sleep.assert_called_with(0.5)
+        self.assertEqual(2, m_sleep.call_count)